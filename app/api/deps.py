@@ -0,0 +1,43 @@
+from datetime import timezone
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.security import verify_token
+from app.crud.user.user import get_user_identity
+from app.db.session import get_write_db
+from app.schemas.user.user import CurrentUser
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def token_issued_before_password_change(payload: dict, user: CurrentUser) -> bool:
+    changed_at = user.password_changed_at
+    if not changed_at:
+        return False
+    if changed_at.tzinfo is None:
+        changed_at = changed_at.replace(tzinfo=timezone.utc)
+    return int(payload.get("iat", 0)) < int(changed_at.timestamp())
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_write_db),
+) -> CurrentUser:
+    """
+    校验 Bearer access token。签名校验结果和用户身份都走进程内缓存，
+    命中时不做 JWT 解码也不查库。
+    """
+    unauthorized = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    if credentials is None:
+        raise unauthorized
+    payload = verify_token(credentials.credentials, token_type="access")
+    if not payload or not payload.get("sub"):
+        raise unauthorized
+    user = await get_user_identity(db, payload["sub"])
+    if not user or token_issued_before_password_change(payload, user):
+        raise unauthorized
+    return user
@@ -0,0 +1,39 @@
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from app.core.config import settings
+from app.core.images import derivative_pool
+from app.core.metrics import render_metrics
+from app.core.security import hash_pool
+from app.crud.fruit.fruit import fruit_lookups
+from app.db.session import db_manager
+from app.tasks.email import email_sender
+from app.tasks.images import destroy_queue
+
+router = APIRouter(tags=["metrics"])
+
+
+def verify_metrics_token(authorization: Optional[str] = Header(None)) -> None:
+    # 未配置 METRICS_TOKEN 时不校验（只应在内网暴露）
+    if settings.METRICS_TOKEN is None:
+        return
+    if not hmac.compare_digest((authorization or "").encode(), f"Bearer {settings.METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False,
+            dependencies=[Depends(verify_metrics_token)])
+async def metrics():
+    """Prometheus 文本格式：请求 / SQL / 线程池直方图，加上各执行器、发件箱和连接池的当前状态"""
+    db_pools = [({"role": "primary"}, db_manager.pool_status())]
+    if db_manager.replica_engine is not None:
+        db_pools.append(({"role": "replica"}, db_manager.replica_pool_status()))
+    body = render_metrics([
+        ("executor", [({"name": pool.name}, pool.stats()) for pool in (hash_pool, derivative_pool)]),
+        ("email_sender", [({}, email_sender.stats())]),
+        ("db_pool", db_pools),
+        ("singleflight", [({"name": "fruit_lookups"}, fruit_lookups.stats())]),
+        ("cloudinary_destroy_queue", [({}, destroy_queue.stats())]),
+    ])
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
@@ -1,114 +1,671 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
-from typing import List, Optional
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.schemas.fruit.fruit import Fruit, FruitCreate, FruitUpdate, ImageMeta, PaginatedFruits
-from app.db.session import get_db
-from app.crud.fruit.fruit import list_fruits, get_fruit, create_fruit, bulk_create, bulk_update, bulk_delete
-from app.core.cloudinary_client import upload_sync, destroy_sync
-from fastapi.concurrency import run_in_threadpool
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
+import asyncio
+import csv
 import io
+import logging
+import os
 from datetime import datetime
+from typing import List, Literal, Optional, Tuple, Union
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.fruit.fruit import (
+    Fruit, FruitCreate, FruitUpdate, FruitFacets, ImageMeta, PaginatedFruits, BulkCreateReport, FruitImportReport,
+    FruitBatch, FruitBatchGetRequest,
+)
+from app.db.session import get_read_db, get_read_session_factory, get_write_db
+from app.core.cache import CachedResponse
+from app.core.serialization import json_dumps, json_loads
+from app.core.utils import iter_lines
+from app.schemas.fruit.serialize import FRUIT_FIELDS, fruit_to_dict, fruits_to_dicts, parse_fields
+from app.crud.fruit.cache import fruit_cache, detail_key, list_key, invalidate_fruit_responses, set_detail, write_generation
+from app.core.config import settings
+from app.api.deps import get_current_user
+from app.crud.fruit.fruit import (
+    list_fruits, fruit_facets, get_fruit, get_fruits_by_ids, create_fruit,
+    bulk_create, bulk_create_copy, bulk_update, bulk_delete, import_chunk, stream_fruits, parse_nutrition_ranges,
+    append_fruit_images, remove_fruit_image,
+)
+from app.core.cloudinary_client import upload_sync
+from app.core.metrics import run_in_threadpool_timed
+from app.core.images import (
+    MAX_IMAGE_BYTES, MAX_MEGAPIXELS, ImageInfo, ImageTooLarge, InvalidImage, UnsupportedImageFormat,
+    derivative_pool, make_derivatives, probe_image, spool_upload,
+)
+from app.tasks.images import destroy_queue
+from app.crud.fruit.image_asset import (
+    acquire_asset, asset_image_meta, asset_public_ids, get_assets_by_hash, register_asset, release_asset,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/fruits", tags=["fruits"])
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # If-None-Match 使用弱比较：两边都忽略 W/ 前缀
+    etag = etag.removeprefix("W/")
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _cached_response(request: Request, cached: CachedResponse) -> Response:
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
 @router.get("/", response_model=PaginatedFruits)
 async def list_fruits_endpoint(
+    request: Request,
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=200),
     q: Optional[str] = None,
     origin: Optional[str] = None,
     season: Optional[str] = None,
-    sort_by: Optional[str] = "name_cn:asc",
-    db: AsyncSession = Depends(get_db),
+    sort_by: Optional[str] = Query(None, description="字段:asc|desc 或 relevance；字段含营养字段如 vitamin_c_mg；默认有 q 时按相关度，否则 name_cn:asc"),
+    search_mode: Literal["auto", "substring", "trigram", "ngram"] = "auto",
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor；传入后按 keyset 分页，忽略 page"),
+    count: Literal["exact", "cached", "estimate", "none"] = "cached",
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，如 id,name_cn,images；id 总会返回"),
+    images_limit: Optional[int] = Query(None, ge=1, le=50, description="每条只返回前 N 张图片"),
+    read_session=Depends(get_read_session_factory),
+):
+    """营养范围筛选用 <营养字段>_<lt|lte|gt|gte>=数值，如 calories_kcal_lt=50&vitamin_c_mg_gte=20"""
+    try:
+        columns = parse_fields(fields)
+        ranges = parse_nutrition_ranges(request.query_params)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    params = {
+        "page": page, "per_page": per_page, "q": q, "origin": origin, "season": season,
+        "sort_by": sort_by, "search_mode": search_mode, "cursor": cursor, "count": count,
+        "ranges": ranges,
+    }
+    key = await list_key({**params, "fields": columns, "images_limit": images_limit})
+    cached = await fruit_cache.get(key)
+    if cached is None:
+        # 指定了投影时总走快速路径：只查需要的列，输出形状随 fields 变化
+        fast = settings.FRUIT_FAST_SERIALIZATION or columns is not None or images_limit is not None
+        columns = columns or FRUIT_FIELDS
+        # 未命中才打开数据库会话
+        async with read_session() as db:
+            try:
+                items, total, next_cursor = await list_fruits(
+                    db, columns=columns if fast else None, images_limit=images_limit, **params
+                )
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail=str(exc))
+        if fast:
+            # 字段顺序与 PaginatedFruits 一致
+            body = json_dumps({
+                "items": fruits_to_dicts(items, columns, images_limit),
+                "total": total, "page": page, "per_page": per_page, "next_cursor": next_cursor,
+            })
+        else:
+            body = PaginatedFruits(
+                items=[Fruit.model_validate(o, from_attributes=True) for o in items],
+                total=total, page=page, per_page=per_page, next_cursor=next_cursor,
+            ).model_dump_json().encode("utf-8")
+        cached = await fruit_cache.set(key, body)
+    return _cached_response(request, cached)
+
+# 注意：必须声明在 /{fruit_id} 之前
+@router.get("/facets", response_model=FruitFacets)
+async def fruit_facets_endpoint(
+    q: Optional[str] = None,
+    origin: Optional[str] = None,
+    season: Optional[str] = None,
+    search_mode: Literal["auto", "substring", "trigram", "ngram"] = "auto",
+    db: AsyncSession = Depends(get_read_db),
+):
+    try:
+        return await fruit_facets(db, q=q, origin=origin, season=season, search_mode=search_mode)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _csv_cell(value):
+    # 列表 / 对象列以 JSON 字符串写入单元格，时间与 NDJSON 一致用 ISO 格式
+    if isinstance(value, (dict, list)):
+        return json_dumps(value).decode("utf-8")
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def _export_rows(read_session, columns, format: str, origin: Optional[str], season: Optional[str]):
+    # 会话随响应流存活，逐批从服务端游标取数据并立即写出
+    async with read_session() as db:
+        if format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+        async for rows in stream_fruits(db, columns, origin=origin, season=season):
+            items = fruits_to_dicts(rows, columns)
+            if format == "ndjson":
+                yield b"".join(json_dumps(item) + b"\n" for item in items)
+                continue
+            writer.writerows([_csv_cell(item[c]) for c in columns] for item in items)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if format == "csv" and buffer.tell():
+            # 结果为空时只有表头
+            yield buffer.getvalue().encode("utf-8")
+
+
+# 注意：必须声明在 /{fruit_id} 之前
+@router.get("/export")
+async def export_fruits_endpoint(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    fields: Optional[str] = Query(None, description="逗号分隔的导出字段；id 总会导出"),
+    origin: Optional[str] = None,
+    season: Optional[str] = None,
+    read_session=Depends(get_read_session_factory),
+):
+    """全量导出，按 id 排序流式输出，内存占用与数据量无关"""
+    try:
+        columns = parse_fields(fields) or FRUIT_FIELDS
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return StreamingResponse(
+        _export_rows(read_session, columns, format, origin, season),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="fruits.{format}"'},
+    )
+
+
+def _parse_import_line(line: bytes) -> dict:
+    """一行 NDJSON → 规范化后的写入数据；带 id 时保留（导出文件可原样导回），出错抛 ValueError"""
+    try:
+        obj = json_loads(line)
+    except ValueError as exc:
+        raise ValueError(f"invalid JSON: {exc}")
+    if not isinstance(obj, dict):
+        raise ValueError("each line must be a JSON object")
+    try:
+        data = FruitCreate.model_validate(obj).model_dump(mode="json")
+    except ValidationError as exc:
+        raise ValueError("; ".join(
+            f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in exc.errors()
+        ))
+    if isinstance(obj.get("id"), str) and obj["id"]:
+        data["id"] = obj["id"]
+    return data
+
+
+@router.post("/import", response_model=FruitImportReport, dependencies=[Depends(get_current_user)])
+async def import_fruits_endpoint(
+    request: Request,
+    chunk_size: Optional[int] = Query(None, ge=1, le=50000),
+    db: AsyncSession = Depends(get_write_db),
 ):
-    items, total = await list_fruits(db, page=page, per_page=per_page, q=q, origin=origin, season=season, sort_by=sort_by)
-    return {"items": items, "total": total, "page": page, "per_page": per_page}
+    """
+    NDJSON 导入（每行一个 FruitCreate，可带 id）：边读请求体边解析，每 chunk_size 行提交一次，
+    坏行跳过并在报告中给出行号和原因。已提交的块不会因后续出错回滚。
+    """
+    chunk_size = chunk_size or settings.FRUIT_IMPORT_CHUNK_SIZE
+    report = {"lines": 0, "inserted": 0, "failed": 0, "chunks": [], "errors": [], "errors_truncated": False}
+    pending: List[Tuple[int, dict]] = []
+
+    def add_error(line_no: int, error: str) -> None:
+        report["failed"] += 1
+        if len(report["errors"]) < settings.FRUIT_IMPORT_MAX_ERRORS:
+            report["errors"].append({"line": line_no, "error": error})
+        else:
+            report["errors_truncated"] = True
+
+    async def flush() -> None:
+        line_numbers = [n for n, _ in pending]
+        ids, errors = await import_chunk(db, [data for _, data in pending])
+        for index, error in errors:
+            add_error(line_numbers[index], error)
+        report["inserted"] += len(ids)
+        report["chunks"].append({
+            "index": len(report["chunks"]), "first_line": line_numbers[0], "last_line": line_numbers[-1],
+            "inserted": len(ids), "failed": len(errors),
+        })
+        logger.info("fruit import: lines %d-%d inserted=%d failed=%d (total inserted=%d)",
+                    line_numbers[0], line_numbers[-1], len(ids), len(errors), report["inserted"])
+        pending.clear()
+
+    async for line in iter_lines(request.stream(), settings.FRUIT_IMPORT_MAX_LINE_BYTES):
+        report["lines"] += 1
+        line_no = report["lines"]
+        if line is None:
+            add_error(line_no, f"line exceeds {settings.FRUIT_IMPORT_MAX_LINE_BYTES} bytes")
+            continue
+        if not line.strip():
+            continue
+        try:
+            pending.append((line_no, _parse_import_line(line)))
+        except ValueError as exc:
+            add_error(line_no, str(exc))
+            continue
+        if len(pending) >= chunk_size:
+            await flush()
+    if pending:
+        await flush()
+    return report
+
+def _detail_body(obj, fast: bool) -> bytes:
+    """详情响应体；fruits:batchGet 复用同一份缓存，两边必须一致"""
+    if fast:
+        return json_dumps(fruit_to_dict(obj))
+    return Fruit.model_validate(obj, from_attributes=True).model_dump_json().encode("utf-8")
+
+
+async def _batch_get(ids: List[str], fields: Optional[str], read_session) -> Response:
+    # 支持 ids=a&ids=b 和 ids=a,b 两种写法；去重但保持请求顺序
+    ids = list(dict.fromkeys(i.strip() for raw in ids for i in raw.split(",") if i.strip()))
+    if not ids:
+        raise HTTPException(status_code=400, detail="ids is required")
+    if len(ids) > settings.FRUIT_BATCH_GET_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"at most {settings.FRUIT_BATCH_GET_MAX_IDS} ids per request")
+    try:
+        columns = parse_fields(fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if columns is None:
+        # 全字段：先取各 id 的详情缓存，未命中的一次 IN 查询补齐并回填缓存
+        cached = await fruit_cache.get_many([detail_key(i) for i in ids])
+        bodies = {i: entry.body for i, entry in zip(ids, cached) if entry is not None}
+        misses = [i for i in ids if i not in bodies]
+        if misses:
+            fast = settings.FRUIT_FAST_SERIALIZATION
+            generation = await write_generation()
+            async with read_session() as db:
+                found = await get_fruits_by_ids(db, misses, columns=FRUIT_FIELDS if fast else None)
+            for fruit_id, obj in found.items():
+                bodies[fruit_id] = (await set_detail(fruit_id, _detail_body(obj, fast), generation)).body
+    else:
+        async with read_session() as db:
+            found = await get_fruits_by_ids(db, ids, columns=columns)
+        bodies = {fruit_id: json_dumps(fruit_to_dict(row, columns)) for fruit_id, row in found.items()}
+    # 各条已是序列化好的 JSON，直接拼接
+    body = b'{"items":[' + b",".join(bodies[i] for i in ids if i in bodies) + b'],"missing":'
+    body += json_dumps([i for i in ids if i not in bodies]) + b"}"
+    return Response(content=body, media_type="application/json")
+
+
+@router.get(":batchGet", response_model=FruitBatch)
+async def batch_get_fruits_endpoint(
+    ids: List[str] = Query(..., description="可重复传或逗号分隔"),
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段；id 总会返回"),
+    read_session=Depends(get_read_session_factory),
+):
+    return await _batch_get(ids, fields, read_session)
+
+
+@router.post(":batchGet", response_model=FruitBatch)
+async def batch_get_fruits_post_endpoint(
+    payload: FruitBatchGetRequest,
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段；id 总会返回"),
+    read_session=Depends(get_read_session_factory),
+):
+    """id 较多、URL 放不下时用 POST"""
+    return await _batch_get(payload.ids, fields, read_session)
+
 
 @router.get("/{fruit_id}", response_model=Fruit)
-async def get_fruit_endpoint(fruit_id: str, db: AsyncSession = Depends(get_db)):
-    obj = await get_fruit(db, fruit_id)
-    if not obj:
-        raise HTTPException(status_code=404, detail="Fruit not found")
-    return obj
+async def get_fruit_endpoint(
+    fruit_id: str,
+    request: Request,
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段；id 总会返回"),
+    read_session=Depends(get_read_session_factory),
+):
+    try:
+        columns = parse_fields(fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if columns is not None:
+        # 投影结果不进缓存（详情按 id 精确失效，无法枚举各种字段组合），直接按列查库
+        async with read_session() as db:
+            obj = await get_fruit(db, fruit_id, columns=columns, coalesce=True)
+        if not obj:
+            raise HTTPException(status_code=404, detail="Fruit not found")
+        return _cached_response(request, CachedResponse(json_dumps(fruit_to_dict(obj, columns))))
+
+    cached = await fruit_cache.get(detail_key(fruit_id))
+    if cached is None:
+        fast = settings.FRUIT_FAST_SERIALIZATION
+        generation = await write_generation()
+        async with read_session() as db:
+            obj = await get_fruit(db, fruit_id, columns=FRUIT_FIELDS if fast else None, coalesce=True)
+        if not obj:
+            raise HTTPException(status_code=404, detail="Fruit not found")
+        cached = await set_detail(fruit_id, _detail_body(obj, fast), generation)
+    return _cached_response(request, cached)
 
-@router.post("/", response_model=Fruit)
-async def create_fruit_endpoint(payload: FruitCreate, db: AsyncSession = Depends(get_db)):
-    return await create_fruit(db, payload.dict())
+@router.post("/", response_model=Fruit, dependencies=[Depends(get_current_user)])
+async def create_fruit_endpoint(payload: FruitCreate, db: AsyncSession = Depends(get_write_db)):
+    # 写入前规范化为 JSON 形态，读路径才能直接输出库里的数据
+    return await create_fruit(db, payload.model_dump(mode="json"))
 
-@router.post("/bulk_create", response_model=List[Fruit])
-async def bulk_create_endpoint(payload: List[FruitCreate], db: AsyncSession = Depends(get_db)):
-    items = [p.dict() for p in payload]
-    return await bulk_create(db, items)
+@router.post("/bulk_create", response_model=Union[List[Fruit], BulkCreateReport],
+             dependencies=[Depends(get_current_user)])
+async def bulk_create_endpoint(
+    payload: List[FruitCreate],
+    mode: Literal["insert", "copy"] = "insert",
+    chunk_size: Optional[int] = Query(None, ge=1, le=50000),
+    db: AsyncSession = Depends(get_write_db),
+):
+    items = [p.model_dump(mode="json") for p in payload]
+    # copy 模式：逐块提交，返回逐块报告而不是完整对象
+    if mode == "copy":
+        return await bulk_create_copy(db, items, chunk_size=chunk_size)
+    return await bulk_create(db, items, chunk_size=chunk_size)
 
-@router.put("/bulk_update")
-async def bulk_update_endpoint(payload: List[FruitUpdate], db: AsyncSession = Depends(get_db)):
-    items = [p.dict() for p in payload]
-    results = await bulk_update(db, items)
+@router.put("/bulk_update", dependencies=[Depends(get_current_user)])
+async def bulk_update_endpoint(payload: List[FruitUpdate], db: AsyncSession = Depends(get_write_db)):
+    # 只合并请求中实际出现的顶层字段
+    items = [p.model_dump(mode="json", include=p.model_fields_set) for p in payload]
+    results, to_destroy = await bulk_update(db, items)
+    # 引用归零的图片在提交后入删除队列
+    destroy_queue.enqueue(to_destroy)
     return {"results": results}
 
-@router.delete("/bulk_delete")
-async def bulk_delete_endpoint(ids: List[str], db: AsyncSession = Depends(get_db)):
-    deleted = await bulk_delete(db, ids)
+@router.delete("/bulk_delete", dependencies=[Depends(get_current_user)])
+async def bulk_delete_endpoint(ids: List[str], db: AsyncSession = Depends(get_write_db)):
+    deleted, to_destroy = await bulk_delete(db, ids)
+    destroy_queue.enqueue(to_destroy)
     return {"deleted": deleted}
 
-# Image upload endpoint: upload file to Cloudinary and append image meta to fruit
-@router.post("/{fruit_id}/images", response_model=ImageMeta)
-async def upload_image(fruit_id: str, file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
-    fruit = await get_fruit(db, fruit_id)
-    if not fruit:
-        raise HTTPException(status_code=404, detail="Fruit not found")
-    content = await file.read()
-    # validate size (Cloudinary limit: 10 MB max image file size)
-    max_size = 10 * 1024 * 1024
-    if len(content) > max_size:
+async def _spool_and_probe(file: UploadFile):
+    """流式落盘并校验图片，返回 (临时文件, ImageInfo)；调用方负责关闭临时文件"""
+    try:
+        spooled, size, sha256 = await spool_upload(file, max_bytes=MAX_IMAGE_BYTES)
+    except ImageTooLarge:
         raise HTTPException(status_code=400, detail="Image too large; max 10MB allowed")
-    # validate mime/type from filename extension (basic) and check megapixels using Pillow
-    allowed = {"jpeg", "jpg", "png", "webp"}
-    filename = file.filename or ""
-    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
-    if ext not in allowed:
-        raise HTTPException(status_code=400, detail="Unsupported image type. Allowed: jpg, jpeg, png, webp")
-    # check megapixels
     try:
-        from PIL import Image
-        img = Image.open(io.BytesIO(content))
-        width, height = img.size
-        megapixels = (width * height) / 1_000_000
-        if megapixels > 25:
+        info = probe_image(spooled, size, sha256=sha256)
+        if info.megapixels > MAX_MEGAPIXELS:
             raise HTTPException(status_code=400, detail="Image too large in pixels; max 25MP allowed")
+    except UnsupportedImageFormat:
+        spooled.close()
+        raise HTTPException(status_code=400, detail="Unsupported image type. Allowed: jpg, jpeg, png, webp")
+    except InvalidImage:
+        spooled.close()
+        raise HTTPException(status_code=400, detail="Invalid image file")
     except HTTPException:
+        spooled.close()
         raise
+    return spooled, info
+
+
+async def _make_derivatives(spooled) -> List[dict]:
+    """进程池里用 Pillow 生成衍生图；失败或池满时跳过，只上传原图"""
+    if not settings.IMAGE_DERIVATIVES_ENABLED:
+        return []
+    try:
+        return await derivative_pool.run(make_derivatives, spooled.name)
     except Exception:
-        # if pillow fails to parse, reject
-        raise HTTPException(status_code=400, detail="Invalid image file")
-    # upload in threadpool because cloudinary SDK is sync
-    res = await run_in_threadpool(upload_sync, io.BytesIO(content), folder="fruits")
-    image_meta = {
+        logger.warning("image derivative generation failed", exc_info=True)
+        return []
+
+
+def _upload_with_derivatives(spooled, derivatives: List[dict], uploaded: List[str]):
+    """uploaded 依次记下已上传成功的 public_id，中途失败时由调用方清理"""
+    res = upload_sync(spooled, folder="fruits")
+    uploaded.append(res.get("public_id"))
+    derived = []
+    for d in derivatives:
+        r = upload_sync(d["path"], folder="fruits/derived")
+        uploaded.append(r.get("public_id"))
+        derived.append({
+            "kind": d["kind"],
+            "url": r.get("secure_url") or r.get("url"),
+            "public_id": r.get("public_id"),
+            "width": d["width"],
+            "height": d["height"],
+            "bytes": d["bytes"],
+            "format": d["format"],
+        })
+    return res, derived
+
+
+async def _upload_new_asset(spooled, info: ImageInfo) -> dict:
+    spooled.seek(0)
+    derivatives = await _make_derivatives(spooled)
+    uploaded: List[str] = []
+    try:
+        # upload in threadpool because cloudinary SDK is sync
+        res, derived = await run_in_threadpool_timed(
+            "cloudinary_upload", _upload_with_derivatives, spooled, derivatives, uploaded,
+        )
+    except Exception:
+        # 原图 / 部分衍生图已上传但不会有资源记录引用，删掉再抛出
+        destroy_queue.enqueue(uploaded)
+        raise
+    finally:
+        for d in derivatives:
+            try:
+                os.unlink(d["path"])
+            except OSError:
+                pass
+    return {
+        "content_hash": info.sha256,
+        "public_id": res.get("public_id"),
         "url": res.get("url") or res.get("secure_url"),
         "secure_url": res.get("secure_url"),
-        "public_id": res.get("public_id"),
-        "alt": file.filename,
-        "source": "cloudinary",
-        "uploaded_at": datetime.utcnow().isoformat(),
+        "format": info.format,
+        "width": info.width,
+        "height": info.height,
+        "bytes": info.size,
+        "derivatives": derived or None,
     }
-    images = fruit.images or []
-    images.append(image_meta)
-    fruit.images = images
-    db.add(fruit)
+
+
+def _image_meta(asset, filename: Optional[str]) -> dict:
+    return ImageMeta.model_validate(asset_image_meta(asset, filename)).model_dump(mode="json")
+
+
+async def _store_images(db: AsyncSession, uploads: List[Tuple[object, ImageInfo]]) -> list:
+    """
+    按内容哈希去重后上传：已存在的资源直接复用，本批内重复内容只传一次。
+    返回与 uploads 对齐的 ImageAsset 或异常；每次使用都会给资源加一次引用（未提交）。
+    远端上传期间不持有数据库连接：查完已有资源即结束事务，上传完成后再登记，
+    并以加引用时（行锁下）库里的记录为准，不依赖上传前的快照。
+    """
+    assets = await get_assets_by_hash(db, [info.sha256 for _, info in uploads])
     await db.commit()
-    await db.refresh(fruit)
-    return image_meta
+    to_upload = {}
+    for spooled, info in uploads:
+        if info.sha256 not in assets and info.sha256 not in to_upload:
+            to_upload[info.sha256] = (spooled, info)
+
+    semaphore = asyncio.Semaphore(settings.IMAGE_UPLOAD_CONCURRENCY)
+
+    async def upload_one(spooled, info):
+        async with semaphore:
+            return await _upload_new_asset(spooled, info)
+
+    outcomes = await asyncio.gather(*(upload_one(sp, info) for sp, info in to_upload.values()),
+                                    return_exceptions=True)
+    failed = {}
+    for content_hash, outcome in zip(to_upload, outcomes):
+        if isinstance(outcome, Exception):
+            failed[content_hash] = outcome
+            continue
+        assets[content_hash] = await _register_uploaded(db, outcome)
+
+    spooled_by_hash = {info.sha256: (spooled, info) for spooled, info in uploads}
+    results = []
+    for _, info in uploads:
+        asset = assets.get(info.sha256)
+        if asset is None:
+            results.append(failed[info.sha256])
+            continue
+        # 上传前查到的是快照：加引用时按库里当前的记录为准
+        current = await acquire_asset(db, info.sha256)
+        if current is None:
+            if asset in db:
+                db.expunge(asset)  # 已删除记录的旧快照，别让它和重新登记的行冲突
+            current = await _reregister(db, *spooled_by_hash[info.sha256])
+            if isinstance(current, Exception):
+                failed[info.sha256] = current
+                del assets[info.sha256]
+                results.append(current)
+                continue
+            assets[info.sha256] = current
+        results.append(current)
+    return results
 
-@router.delete("/{fruit_id}/images")
-async def delete_image(fruit_id: str, public_id: str, db: AsyncSession = Depends(get_db)):
-    fruit = await get_fruit(db, fruit_id)
+
+async def _reregister(db: AsyncSession, spooled, info: ImageInfo):
+    """查到资源之后它的最后一个引用被释放、记录已删：重新上传登记并加引用，返回 asset 或异常"""
+    try:
+        await _register_uploaded(db, await _upload_new_asset(spooled, info))
+    except Exception as exc:
+        return exc
+    current = await acquire_asset(db, info.sha256)
+    if current is None:
+        return HTTPException(status_code=409, detail="Image was deleted concurrently, please retry")
+    return current
+
+
+async def _register_uploaded(db: AsyncSession, outcome: dict):
+    asset, created = await register_asset(db, outcome)
+    if not created:
+        # 并发请求已登记了同一内容，删掉本次多传的远端资源
+        destroy_queue.enqueue([outcome["public_id"]] + [d["public_id"] for d in outcome["derivatives"] or []])
+    return asset
+
+
+async def _release_images(db: AsyncSession, public_ids: List[str]) -> List[str]:
+    """
+    撤销引用（水果已不存在、图片未能挂上去），返回需要删除的远端 public_id，
+    由调用方在提交后入删除队列。
+    """
+    to_destroy = []
+    for public_id in public_ids:
+        _, released = await release_asset(db, public_id)
+        if released:
+            to_destroy.extend(asset_public_ids(released))
+    return to_destroy
+
+
+# Image upload endpoint: upload file to Cloudinary and append image meta to fruit
+@router.post("/{fruit_id}/images", response_model=ImageMeta, dependencies=[Depends(get_current_user)])
+async def upload_image(fruit_id: str, file: UploadFile = File(...), db: AsyncSession = Depends(get_write_db)):
+    fruit = await get_fruit(db, fruit_id, columns=("id",))
     if not fruit:
         raise HTTPException(status_code=404, detail="Fruit not found")
-    # destroy in threadpool
-    await run_in_threadpool(destroy_sync, public_id)
-    images = [img for img in (fruit.images or []) if img.get("public_id") != public_id]
-    fruit.images = images
-    db.add(fruit)
+    # 读取上传内容期间不占用连接
+    await db.commit()
+    # 分块读取并限制大小，格式按文件头判断；同一个临时文件句柄直接交给上传
+    spooled, info = await _spool_and_probe(file)
+    with spooled:
+        (outcome,) = await _store_images(db, [(spooled, info)])
+    if isinstance(outcome, Exception):
+        raise outcome
+    image_meta = _image_meta(outcome, file.filename)
+    # 库内原子追加，并发上传到同一水果不会丢图
+    if not await append_fruit_images(db, fruit_id, [image_meta]):
+        # 上传期间水果被删除
+        to_destroy = await _release_images(db, [outcome.public_id])
+        await db.commit()
+        destroy_queue.enqueue(to_destroy)
+        raise HTTPException(status_code=404, detail="Fruit not found")
+    await db.commit()
+    await invalidate_fruit_responses([fruit_id])
+    return image_meta
+
+async def _batch_upload(db: AsyncSession, targets: List[Tuple[str, UploadFile]]) -> dict:
+    """
+    并发校验全部文件，按 IMAGE_UPLOAD_CONCURRENCY 限流上传（内容重复的只传一次），
+    最后按水果原子追加 ImageMeta 并只提交一次。逐文件返回结果。
+    """
+    if not targets:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    if len(targets) > settings.IMAGE_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files; max {settings.IMAGE_BATCH_MAX_FILES} per request")
+    fruits = await get_fruits_by_ids(db, [fid for fid, _ in targets], columns=("id",))
+    # 校验 / 上传期间不占用连接
+    await db.commit()
+    results = [
+        {"index": i, "fruit_id": fid, "filename": f.filename, "ok": False, "msg": None, "image": None}
+        for i, (fid, f) in enumerate(targets)
+    ]
+
+    async def validate(i: int, file: UploadFile):
+        if targets[i][0] not in fruits:
+            results[i]["msg"] = "Fruit not found"
+            return None
+        try:
+            return await _spool_and_probe(file)
+        except HTTPException as exc:
+            results[i]["msg"] = exc.detail
+            return None
+
+    validated = await asyncio.gather(*(validate(i, f) for i, (_, f) in enumerate(targets)))
+    indexes = [i for i, v in enumerate(validated) if v is not None]
+    try:
+        outcomes = await _store_images(db, [validated[i] for i in indexes])
+    finally:
+        for i in indexes:
+            validated[i][0].close()
+
+    # 所有上传完成后统一写库：每个水果一条原子追加
+    per_fruit = {}
+    for i, outcome in zip(indexes, outcomes):
+        r = results[i]
+        if isinstance(outcome, Exception):
+            r["msg"] = f"Upload failed: {outcome}"
+            continue
+        r["image"] = _image_meta(outcome, r["filename"])
+        per_fruit.setdefault(r["fruit_id"], []).append(r)
+    to_destroy = []
+    for fruit_id, rows in per_fruit.items():
+        if await append_fruit_images(db, fruit_id, [r["image"] for r in rows]):
+            for r in rows:
+                r["ok"], r["msg"] = True, "uploaded"
+            continue
+        to_destroy += await _release_images(db, [r["image"]["public_id"] for r in rows])
+        for r in rows:
+            r["image"], r["msg"] = None, "Fruit not found"
+    await db.commit()
+    destroy_queue.enqueue(to_destroy)
+    await invalidate_fruit_responses({r["fruit_id"] for r in results if r["ok"]})
+    return {"results": results}
+
+@router.post("/images:batch", dependencies=[Depends(get_current_user)])
+async def upload_images_batch_multi(
+    fruit_ids: List[str] = Form(..., description="与 files 一一对应的水果 id"),
+    files: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_write_db),
+):
+    if len(fruit_ids) != len(files):
+        raise HTTPException(status_code=400, detail="fruit_ids and files must have the same length")
+    return await _batch_upload(db, list(zip(fruit_ids, files)))
+
+@router.post("/{fruit_id}/images:batch", dependencies=[Depends(get_current_user)])
+async def upload_images_batch(fruit_id: str, files: List[UploadFile] = File(...), db: AsyncSession = Depends(get_write_db)):
+    if not await get_fruit(db, fruit_id, columns=("id",)):
+        raise HTTPException(status_code=404, detail="Fruit not found")
+    return await _batch_upload(db, [(fruit_id, f) for f in files])
+
+@router.delete("/{fruit_id}/images", dependencies=[Depends(get_current_user)])
+async def delete_image(fruit_id: str, public_id: str, db: AsyncSession = Depends(get_write_db)):
+    # 锁行后库内删除，不整体改写列表
+    removed = await remove_fruit_image(db, fruit_id, public_id)
+    if removed is None:
+        raise HTTPException(status_code=404, detail="Fruit not found")
+    to_destroy = []
+    if removed:
+        # 去重资源可能被其他水果引用，引用归零才删除远端
+        tracked, released = await release_asset(db, public_id, removed)
+        to_destroy = asset_public_ids(released) if released else ([] if tracked else [public_id])
     await db.commit()
-    await db.refresh(fruit)
+    await invalidate_fruit_responses([fruit_id])
+    # 提交后入队，由后台批量删除远端资源，请求不等待 Cloudinary
+    destroy_queue.enqueue(to_destroy)
     return {"ok": True}
@@ -1,17 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException,status
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.schemas.user.user import UserCreate, UserOut, ResetPassword
-from app.crud.user.user import create_user, get_user_by_email, authenticate_user, update_user_password
-from app.db.session import get_db
+from app.schemas.user.user import UserCreate, UserOut, ResetPassword, RefreshRequest
+from app.crud.user.user import (
+    create_user, get_user_by_email, authenticate_user, update_user_password,
+    get_user_identity, invalidate_user_identity, mark_password_changed,
+)
+from app.api.deps import token_issued_before_password_change
+from app.db.session import get_write_db
 from app.core.security import create_access_token, create_password_reset_token, verify_password_reset_token
-from app.tasks.email import send_email
-from app.core.security import create_access_token, create_refresh_token
-from app.db.models.user.reset_token import PasswordResetToken
+from app.tasks.email import email_sender
+from app.crud.email.outbox import enqueue_email
+from app.core.security import create_access_token, create_refresh_token, verify_token
+from app.crud.user.reset_token import add_reset_token, consume_reset_token, peek_reset_token, record_failed_attempt
 from datetime import datetime
-from sqlalchemy import select
 from datetime import timedelta
 from app.db.models.user.user import User
-from app.core.security import hash_password
+from app.core.security import hash_password_async
+from app.core.rate_limit import rate_limit
+from app.core.config import settings
 import re
 import uuid
 
@@ -21,16 +27,19 @@ MAX_FAILED_ATTEMPTS = 4
 
 router = APIRouter(prefix="/users", tags=["users"])
 
-@router.post("/register", response_model=UserOut, status_code=201)
-async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
+@router.post("/register", response_model=UserOut, status_code=201,
+             dependencies=[Depends(rate_limit("register", ip=settings.RATE_LIMIT_REGISTER_IP))])
+async def register(user: UserCreate, db: AsyncSession = Depends(get_write_db)):
     existing = await get_user_by_email(db, user.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     new_user = await create_user(db, user.email, user.password)
     return new_user
 
-@router.post("/login")
-async def login(user: UserCreate, db: AsyncSession = Depends(get_db)):
+@router.post("/login", dependencies=[Depends(rate_limit(
+    "login", ip=settings.RATE_LIMIT_LOGIN_IP, email=settings.RATE_LIMIT_LOGIN_EMAIL,
+))])
+async def login(user: UserCreate, db: AsyncSession = Depends(get_write_db)):
     authenticated_user = await authenticate_user(db, user.email, user.password)
     if not authenticated_user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
@@ -45,8 +54,26 @@ async def login(user: UserCreate, db: AsyncSession = Depends(get_db)):
         "token_type": "bearer"
     }
 
-@router.post("/forgot-password")
-async def forgot_password(email: str, db: AsyncSession = Depends(get_db)):
+@router.post("/refresh")
+async def refresh(data: RefreshRequest, db: AsyncSession = Depends(get_write_db)):
+    payload = verify_token(data.refresh_token, token_type="refresh")
+    if not payload or not payload.get("sub"):
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+    user = await get_user_identity(db, payload["sub"])
+    if not user or token_issued_before_password_change(payload, user):
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+
+    # 轮换：同时签发新的 access / refresh token
+    return {
+        "access_token": create_access_token({"sub": user.email}),
+        "refresh_token": create_refresh_token({"sub": user.email}),
+        "token_type": "bearer"
+    }
+
+@router.post("/forgot-password", dependencies=[Depends(rate_limit(
+    "forgot_password", ip=settings.RATE_LIMIT_FORGOT_PASSWORD_IP, email=settings.RATE_LIMIT_FORGOT_PASSWORD_EMAIL,
+))])
+async def forgot_password(email: str, db: AsyncSession = Depends(get_write_db)):
     user = await get_user_by_email(db, email)
     if not user:
         raise HTTPException(status_code=404, detail="Email not found")
@@ -55,14 +82,8 @@ async def forgot_password(email: str, db: AsyncSession = Depends(get_db)):
     reset_token = create_password_reset_token({"sub": str(user.id)})
     expires_at = datetime.utcnow() + timedelta(minutes=10)
 
-    # 存储 token
-    token_obj = PasswordResetToken(
-        token=reset_token,
-        user_id=str(user.id),
-        expires_at=expires_at
-    )
-    db.add(token_obj)
-    await db.commit()
+    # 存储 token（只存摘要）
+    add_reset_token(db, reset_token, user_id=str(user.id), expires_at=expires_at)
 
     frontend_base = "https://react-test-tan-eight.vercel.app"
     reset_link = f"{frontend_base}/reset_password.html?token={reset_token}"
@@ -78,13 +99,16 @@ Hi,
 
 如果不是你本人操作，请忽略本邮件。
 """
-    await send_email(to_email=email, subject=subject, body=body)
+    # 邮件写入发件箱，与 token 同一事务提交；后台发送器负责投递
+    enqueue_email(db, to_email=email, subject=subject, body=body)
+    await db.commit()
+    email_sender.wake()
 
     return {"msg": f"Password reset link sent to {email}", "test_token": reset_token}
 
 
 @router.post("/reset-password")
-async def reset_password(data: ResetPassword, db: AsyncSession = Depends(get_db)):
+async def reset_password(data: ResetPassword, db: AsyncSession = Depends(get_write_db)):
     # 防止空 token
     if not data.token or not isinstance(data.token, str) or len(data.token) < 10:
         raise HTTPException(status_code=400, detail="无效或已失效的链接")
@@ -94,40 +118,16 @@ async def reset_password(data: ResetPassword, db: AsyncSession = Depends(get_db)
     if not payload:
         raise HTTPException(status_code=400, detail="无效或过期的链接")
 
-    token_record = (await db.execute(
-        select(PasswordResetToken).where(PasswordResetToken.token == data.token)
-    )).scalar_one_or_none()
-
-    if not token_record:
-        raise HTTPException(status_code=400, detail="无效或已失效的链接")
-
-    # 检查是否过期
-    if datetime.utcnow() > token_record.expires_at:
-        await db.delete(token_record)
-        await db.commit()
-        raise HTTPException(status_code=400, detail="链接已过期，请重新申请重置")
-
-    # 检查失败次数：达到或超过阈值则立即失效
-    if (token_record.failed_attempts or 0) >= MAX_FAILED_ATTEMPTS:
-        await db.delete(token_record)
-        await db.commit()
-        raise HTTPException(status_code=400, detail="连续失败次数过多，链接已失效")
-
-    # 检查密码格式
+    # 检查密码格式：不合格时一条条件 UPDATE 累加失败次数（过期 / 不存在 / 已达上限的 token 不会命中）
     pattern = r"^(?=.*[A-Za-z])(?=.*\d)(?=.*[^A-Za-z\d]).{8,20}$"
     if not re.match(pattern, data.new_password):
-        # 记录一次尝试和一次失败（处理 None 情况）
-        token_record.attempt_count = (token_record.attempt_count or 0) + 1
-        token_record.failed_attempts = (token_record.failed_attempts or 0) + 1
-
-        # 如果失败次数达到或超过阈值，则删除 token 并拒绝
-        if token_record.failed_attempts >= MAX_FAILED_ATTEMPTS:
-            await db.delete(token_record)
-            await db.commit()
-            raise HTTPException(status_code=400, detail="连续失败次数过多，链接已失效")
-
+        failed = await record_failed_attempt(db, data.token, MAX_FAILED_ATTEMPTS)
         await db.commit()
-        remaining = max(0, MAX_FAILED_ATTEMPTS - token_record.failed_attempts)
+        if failed is None:
+            raise HTTPException(status_code=400, detail="无效或已失效的链接")
+        if failed >= MAX_FAILED_ATTEMPTS:
+            raise HTTPException(status_code=400, detail="连续失败次数过多，链接已失效")
+        remaining = max(0, MAX_FAILED_ATTEMPTS - failed)
         raise HTTPException(status_code=400, detail=f"密码格式错误（剩余 {remaining} 次机会）")
 
     # 获取用户
@@ -137,13 +137,29 @@ async def reset_password(data: ResetPassword, db: AsyncSession = Depends(get_db)
     except ValueError:
         raise HTTPException(status_code=400, detail="Token 内用户ID无效")
 
+    # 先用一条只读查询确认 token 可用，无效 / 已用过的 token 不占用哈希执行池；
+    # 结束读事务再算哈希，之后在短事务里消费 token 并更新密码
+    token_user_id = await peek_reset_token(db, data.token, MAX_FAILED_ATTEMPTS)
+    await db.rollback()
+    if token_user_id is None or token_user_id != user_id:
+        raise HTTPException(status_code=400, detail="无效或已失效的链接")
+    new_hash = await hash_password_async(data.new_password)
+
+    # 条件 DELETE ... RETURNING：token 只能成功使用一次
+    token_user_id = await consume_reset_token(db, data.token, MAX_FAILED_ATTEMPTS)
+    if token_user_id is None or token_user_id != user_id:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="无效或已失效的链接")
+
     user = await db.get(User, user_uuid)
     if not user:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="用户不存在")
 
-    # 更新密码并立即失效
-    user.hashed_password = hash_password(data.new_password)
-    await db.delete(token_record)
+    # 更新密码，token 已在同一事务中删除
+    user.hashed_password = new_hash
+    mark_password_changed(user)
     await db.commit()
+    invalidate_user_identity(user.email)
 
     return {"msg": "✅ 密码重置成功！链接已失效。"}
@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence
+
+
+class TTLCache:
+    """进程内 LRU + TTL 缓存（单 worker 内共享，不跨进程）"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CacheBackend:
+    """
+    缓存后端接口。默认进程内实现；多 worker 部署可接入 Redis 等共享存储，
+    只需实现以下几个方法。
+    """
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        """批量读取，默认逐个 get；共享存储后端可覆盖为一次往返（如 Redis MGET）"""
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError
+
+    async def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> int:
+        """原子自增计数器（不过期），用于按代失效一组 key"""
+        raise NotImplementedError
+
+    async def counter(self, key: str) -> int:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, maxsize: int = 4096, ttl: float = 60.0):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._counters: dict = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._cache.set(key, value, ttl=ttl)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._cache.pop(key)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes, etag: Optional[str] = None):
+        self.body = body
+        # 弱 ETag：响应体内容哈希。GZipMiddleware 会按 Accept-Encoding 压缩同一份响应体，
+        # 压缩前后字节不同，不能共用强 ETag
+        self.etag = etag or 'W/"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class ResponseCache:
+    """缓存已序列化的 JSON 响应体；ETag 由响应体计算，命中时无需重新序列化"""
+
+    def __init__(self, backend: CacheBackend, ttl: float = 60.0):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def _decode(raw: Optional[bytes]) -> Optional[CachedResponse]:
+        if raw is None:
+            return None
+        # 存储格式：ETag + 换行 + 响应体
+        etag, _, body = raw.partition(b"\n")
+        return CachedResponse(body, etag.decode("ascii"))
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        return self._decode(await self.backend.get(key))
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[CachedResponse]]:
+        return [self._decode(raw) for raw in await self.backend.get_many(keys)]
+
+    async def set(self, key: str, body: bytes) -> CachedResponse:
+        entry = CachedResponse(body)
+        await self.backend.set(key, entry.etag.encode("ascii") + b"\n" + body, self.ttl)
+        return entry
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.backend.delete(*keys)
+
+
+class SingleFlight:
+    """
+    合并并发的相同调用：同一 key 已有调用在执行时，后来者等待并共享它的结果（或异常），
+    不再重复执行。只合并正在进行的调用，结果不缓存。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is not None:
+            self.shared += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # 执行者被取消（如客户端断开）时由当前调用者自己重新执行
+                if future.cancelled():
+                    return await self.do(key, fn)
+                raise
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.calls += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # 没有等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._calls), "calls": self.calls, "shared": self.shared}
@@ -1,11 +1,18 @@
+import logging
 import os
-import cloudinary
-import cloudinary.uploader
+import threading
 try:
     from app.core.config import settings
 except ImportError:
     settings = None
 
+logger = logging.getLogger(__name__)
+
+# cloudinary SDK 首次使用（或预热）时才导入和配置，不拖慢进程启动
+_lock = threading.Lock()
+_uploader = None
+
+
 def get_cloudinary_config():
     if settings:
         cloud_name = getattr(settings, "CLOUDINARY_CLOUD_NAME", None)
@@ -15,16 +22,23 @@ def get_cloudinary_config():
         cloud_name = os.getenv("CLOUDINARY_CLOUD_NAME")
         api_key = os.getenv("CLOUDINARY_API_KEY")
         api_secret = os.getenv("CLOUDINARY_API_SECRET")
-    print(f"✅ Cloudinary configured: cloud_name={cloud_name}, api_key={'set' if api_key else 'missing'}")
+    return {"cloud_name": cloud_name, "api_key": api_key, "api_secret": api_secret}
 
-    cloudinary.config(
-        cloud_name=cloud_name,
-        api_key=api_key,
-        api_secret=api_secret,
-        secure=True,
-    )
 
-get_cloudinary_config()
+def get_uploader():
+    """导入并配置 cloudinary，返回 cloudinary.uploader；线程安全，只执行一次"""
+    global _uploader
+    if _uploader is None:
+        with _lock:
+            if _uploader is None:
+                import cloudinary
+                import cloudinary.uploader
+                config = get_cloudinary_config()
+                cloudinary.config(secure=True, **config)
+                logger.info("Cloudinary configured: cloud_name=%s, api_key=%s",
+                            config["cloud_name"], "set" if config["api_key"] else "missing")
+                _uploader = cloudinary.uploader
+    return _uploader
 
 
 def upload_sync(file_stream, folder=None, public_id=None, **options):
@@ -34,8 +48,30 @@ def upload_sync(file_stream, folder=None, public_id=None, **options):
     if public_id:
         opts["public_id"] = public_id
     opts.update(options)
-    return cloudinary.uploader.upload(file_stream, **opts)
+    return get_uploader().upload(file_stream, **opts)
 
 
 def destroy_sync(public_id, **options):
-    return cloudinary.uploader.destroy(public_id, **options)
+    return get_uploader().destroy(public_id, **options)
+
+
+def get_api():
+    """cloudinary.api（管理接口：批量删除、列出资源），配置与 get_uploader 共用"""
+    get_uploader()
+    import cloudinary.api
+    return cloudinary.api
+
+
+def delete_resources_sync(public_ids, **options):
+    """批量删除，单次最多 100 个；返回 {"deleted": {public_id: "deleted" | "not_found"}, ...}"""
+    return get_api().delete_resources(list(public_ids), **options)
+
+
+def list_resources_sync(prefix=None, next_cursor=None, max_results=500, **options):
+    opts = {"type": "upload", "max_results": max_results}
+    if prefix:
+        opts["prefix"] = prefix
+    if next_cursor:
+        opts["next_cursor"] = next_cursor
+    opts.update(options)
+    return get_api().resources(**opts)
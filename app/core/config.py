@@ -1,7 +1,29 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # 连接池：每个 worker 一个池。设置了总连接预算时按 WEB_CONCURRENCY 均分，
+    # 显式的 DB_POOL_SIZE 优先；每个 worker 至少需要 2 条连接（启动锁 + 建表）
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: int = 10
+    DB_TOTAL_CONNECTION_BUDGET: Optional[int] = None
+    DB_POOL_TIMEOUT: float = 30.0
+    # 连接最长复用时间（秒），-1 表示不回收
+    DB_POOL_RECYCLE: int = 1800
+    # checkout 前 ping 一次（多一次往返）；关闭时依靠 DB_POOL_RECYCLE
+    DB_PRE_PING: bool = False
+    # asyncpg 预编译语句缓存，PgBouncer transaction 模式需设为 0
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # uvicorn worker 进程数（启动命令 --workers 读取同一环境变量）
+    WEB_CONCURRENCY: int = 1
+    # 只读副本：设置后水果读接口走副本，写入与鉴权走主库；副本不健康时读回退主库
+    DATABASE_REPLICA_URL: Optional[str] = None
+    # 写入后该秒数内读主库：写入的客户端靠 cookie，本进程有水果写入时所有读请求
+    DB_READ_YOUR_WRITES_SECONDS: float = 5.0
+    # 副本健康检查间隔 / 超时（秒）
+    DB_REPLICA_HEALTH_INTERVAL: float = 5.0
+    DB_REPLICA_HEALTH_TIMEOUT: float = 2.0
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
 
@@ -10,12 +32,126 @@ class Settings(BaseSettings):
     EMAIL_PORT: int
     EMAIL_USER: str
     EMAIL_PASSWORD: str
+    # 465 端口默认直连 TLS、587 默认 STARTTLS；显式设置时覆盖按端口推断
+    EMAIL_USE_TLS: Optional[bool] = None
+    EMAIL_START_TLS: Optional[bool] = None
+    # 是否登录 SMTP（本地测试用的 SMTP 服务一般不需要）
+    EMAIL_AUTH: bool = True
+    EMAIL_TIMEOUT: float = 30.0
+
+    # 邮件发件箱后台发送器：连接池大小、每批领取条数、空闲轮询间隔（秒）
+    EMAIL_SENDER_ENABLED: bool = True
+    EMAIL_POOL_SIZE: int = 2
+    EMAIL_BATCH_SIZE: int = 20
+    EMAIL_POLL_INTERVAL: float = 5.0
+    # 领取后的租约（秒），进程崩溃时到期重新投递
+    EMAIL_LEASE_SECONDS: float = 120.0
+    # 失败重试：指数退避，超过次数标记为 failed
+    EMAIL_MAX_ATTEMPTS: int = 6
+    EMAIL_RETRY_BASE_DELAY: float = 10.0
+    EMAIL_RETRY_MAX_DELAY: float = 900.0
+    # 已发送 / 已放弃的邮件保留时长（秒），到期由后台定期按批删除：清理间隔（秒，0 表示关闭）、每批删除条数
+    EMAIL_OUTBOX_RETENTION: float = 7 * 86400
+    EMAIL_OUTBOX_PURGE_INTERVAL: float = 3600.0
+    EMAIL_OUTBOX_PURGE_BATCH_SIZE: int = 1000
+
+    # 过期的密码重置 token 定期批量清理：间隔（秒，0 表示关闭）、每批删除条数
+    RESET_TOKEN_PURGE_INTERVAL: float = 600.0
+    RESET_TOKEN_PURGE_BATCH_SIZE: int = 1000
+
+    # 登录 / 注册 / 找回密码限流，规则格式 "次数/秒"；多 worker 时每个进程单独计数
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    # 部署在反向代理后面时才开启，否则 X-Forwarded-For 可被伪造
+    RATE_LIMIT_TRUST_FORWARDED: bool = False
+    RATE_LIMIT_LOGIN_IP: str = "30/60"
+    RATE_LIMIT_LOGIN_EMAIL: str = "10/60"
+    RATE_LIMIT_REGISTER_IP: str = "10/60"
+    RATE_LIMIT_FORGOT_PASSWORD_IP: str = "10/300"
+    RATE_LIMIT_FORGOT_PASSWORD_EMAIL: str = "3/300"
 
     # Cloudinary 配置
     CLOUDINARY_CLOUD_NAME: str
     CLOUDINARY_API_KEY: str
     CLOUDINARY_API_SECRET: str
 
+    # 列表 total 缓存（按筛选条件缓存 count 结果，秒）
+    FRUIT_COUNT_CACHE_TTL: int = 30
+    FRUIT_COUNT_CACHE_SIZE: int = 1024
+    # 水果详情 / 列表响应缓存（秒，条目数）
+    FRUIT_CACHE_TTL: int = 300
+    FRUIT_CACHE_SIZE: int = 4096
+    # 进程内缓存（响应缓存默认后端、total 缓存）的失效只作用于本 worker：
+    # WEB_CONCURRENCY > 1 时 TTL 不超过该值（秒），即其他 worker 最多返回这么久的旧数据 / ETag。
+    # 响应缓存换成共享后端（set_fruit_cache_backend）后不受此限制
+    FRUIT_CACHE_MULTI_WORKER_TTL: int = 5
+
+    # bulk_create 分块大小（insert 模式：INSERT ... RETURNING；copy 模式：asyncpg COPY）
+    BULK_INSERT_CHUNK_SIZE: int = 500
+    BULK_COPY_CHUNK_SIZE: int = 5000
+    # 流式导出每批从服务端游标取的行数；流式导入每块提交的行数、单行最大字节数、报告中最多列出的错误行数
+    FRUIT_EXPORT_BATCH_SIZE: int = 1000
+    FRUIT_IMPORT_CHUNK_SIZE: int = 1000
+    FRUIT_IMPORT_MAX_LINE_BYTES: int = 1_048_576
+    FRUIT_IMPORT_MAX_ERRORS: int = 100
+
+    # 密码哈希（argon2）执行池：thread / process，排队上限超出返回 503
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # 登录成功时若哈希参数已过时则顺带重新哈希
+    PASSWORD_REHASH_ON_LOGIN: bool = False
+    # argon2 参数，留空使用 passlib 默认值
+    ARGON2_TIME_COST: Optional[int] = None
+    ARGON2_MEMORY_COST: Optional[int] = None
+    ARGON2_PARALLELISM: Optional[int] = None
+
+    # 鉴权缓存：已验证 token（按签名）和用户身份（按邮箱），秒
+    AUTH_TOKEN_CACHE_TTL: int = 300
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    AUTH_USER_CACHE_TTL: int = 60
+    AUTH_USER_CACHE_SIZE: int = 10000
+
+    # 批量图片上传：单次最多文件数、同时进行的 Cloudinary 上传数
+    IMAGE_BATCH_MAX_FILES: int = 20
+    IMAGE_UPLOAD_CONCURRENCY: int = 4
+    # 缩略图 / WebP 衍生图生成池（Pillow），关闭则只上传原图
+    IMAGE_DERIVATIVES_ENABLED: bool = True
+    IMAGE_DERIVATIVE_EXECUTOR: str = "process"
+    IMAGE_DERIVATIVE_WORKERS: int = 2
+    IMAGE_DERIVATIVE_MAX_PENDING: int = 32
+    # Cloudinary 删除队列：提交后入队，后台批量调用 delete_resources（单次最多 100 个），失败重试次数
+    CLOUDINARY_DESTROY_BATCH_SIZE: int = 100
+    CLOUDINARY_DESTROY_FLUSH_INTERVAL: float = 2.0
+    CLOUDINARY_DESTROY_MAX_ATTEMPTS: int = 5
+    # 孤儿资源清理：删除远端存在、库里无引用且创建超过 MIN_AGE 秒的资源；间隔 0 表示关闭
+    CLOUDINARY_ORPHAN_SWEEP_INTERVAL: float = 0
+    CLOUDINARY_ORPHAN_MIN_AGE: float = 86400
+    CLOUDINARY_ORPHAN_SWEEP_MAX: int = 1000
+    CLOUDINARY_ORPHAN_DRY_RUN: bool = False
+
+    # 启动后预加载 Cloudinary / argon2 / SMTP / Pillow 等重型依赖（秒后开始，不阻塞启动）
+    WARMUP_ENABLED: bool = True
+    WARMUP_DELAY: float = 1.0
+
+    # fruits:batchGet 单次最多 id 数
+    FRUIT_BATCH_GET_MAX_IDS: int = 100
+    # 水果读接口直接按列取行 + orjson 输出，跳过 Pydantic 校验
+    FRUIT_FAST_SERIALIZATION: bool = True
+    # 响应体超过该字节数才 gzip 压缩，0 表示关闭
+    GZIP_MINIMUM_SIZE: int = 1024
+
+    # 调试模式：响应带 Server-Timing 头（总耗时 / SQL 耗时与条数 / 线程池排队）
+    DEBUG: bool = False
+    # 请求指标与 /metrics（Prometheus 文本格式），默认关闭；
+    # 设置 METRICS_TOKEN 后抓取方需带 Authorization: Bearer <token>
+    METRICS_ENABLED: bool = False
+    METRICS_TOKEN: Optional[str] = None
+    # 超过该毫秒数的 SQL 记慢查询日志
+    SLOW_QUERY_MS: float = 200.0
+    # 单个请求允许的 SQL 条数（N+1 检测），None 不检查；STRICT 时超出直接报错，测试环境用
+    QUERY_BUDGET_PER_REQUEST: Optional[int] = None
+    QUERY_BUDGET_STRICT: bool = False
 
     class Config:
         env_file = ".env"
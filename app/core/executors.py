@@ -0,0 +1,85 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class ExecutorOverloaded(Exception):
+    """排队任务已达上限，调用方应返回 503 让客户端稍后重试"""
+
+    def __init__(self, name: str, retry_after: int = 1):
+        super().__init__(f"{name} executor overloaded")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    带准入控制的线程 / 进程池：同时在跑 + 排队的任务数不超过 max_pending，
+    超出直接拒绝而不是无限排队。池在首次使用时才创建。
+    """
+
+    def __init__(self, name: str, kind: str = "thread", max_workers: int = 2, max_pending: int = 64):
+        if kind not in ("thread", "process"):
+            raise ValueError("kind must be 'thread' or 'process'")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+
+    def _ensure(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise ExecutorOverloaded(self.name)
+        self._pending += 1
+        self.submitted += 1
+        started = time.perf_counter()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._ensure(), fn, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._pending -= 1
+            elapsed = time.perf_counter() - started
+            self._total_seconds += elapsed
+            self._max_seconds = max(self._max_seconds, elapsed)
+        self.completed += 1
+        return result
+
+    def stats(self) -> dict:
+        finished = self.completed + self.failed
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self._pending,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_latency_ms": round(self._total_seconds / finished * 1000, 3) if finished else 0.0,
+            "max_latency_ms": round(self._max_seconds * 1000, 3),
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
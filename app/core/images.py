@@ -0,0 +1,143 @@
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, List, Optional, Tuple
+from fastapi import UploadFile
+from app.core.config import settings
+from app.core.executors import BoundedExecutor
+
+# Cloudinary 限制：单张图片最大 10 MB
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+MAX_MEGAPIXELS = 25
+CHUNK_SIZE = 64 * 1024
+ALLOWED_FORMATS = ("jpeg", "png", "webp")
+
+# 本地生成的衍生图：(名称, 最长边像素或 None 表示原尺寸, 输出格式)
+DERIVATIVE_SPECS = (
+    ("thumb", 320, "WEBP"),
+    ("webp", None, "WEBP"),
+)
+DERIVATIVE_QUALITY = 80
+
+# Pillow 缩放 / 编码是 CPU 密集型，放进独立进程池
+derivative_pool = BoundedExecutor(
+    "image_derivatives",
+    kind=settings.IMAGE_DERIVATIVE_EXECUTOR,
+    max_workers=settings.IMAGE_DERIVATIVE_WORKERS,
+    max_pending=settings.IMAGE_DERIVATIVE_MAX_PENDING,
+)
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+class UnsupportedImageFormat(InvalidImage):
+    pass
+
+
+@dataclass
+class ImageInfo:
+    format: str
+    width: int
+    height: int
+    size: int
+    sha256: Optional[str] = None
+
+    @property
+    def megapixels(self) -> float:
+        return (self.width * self.height) / 1_000_000
+
+
+def sniff_image_format(header: bytes) -> Optional[str]:
+    """按文件头 magic bytes 判断格式，不信任文件名扩展名"""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+async def spool_upload(upload: UploadFile, max_bytes: int = MAX_IMAGE_BYTES,
+                       chunk_size: int = CHUNK_SIZE) -> Tuple[BinaryIO, int, str]:
+    """
+    分块读取上传内容写入临时文件，超过 max_bytes 立即中止。
+    返回已 seek(0) 的临时文件（关闭即删除）、字节数和 sha256；内存占用只有一个 chunk。
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise ImageTooLarge(upload.size)
+    spooled = tempfile.NamedTemporaryFile(prefix="upload-")
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise ImageTooLarge(size)
+            digest.update(chunk)
+            spooled.write(chunk)
+    except BaseException:
+        spooled.close()
+        raise
+    spooled.flush()
+    spooled.seek(0)
+    return spooled, size, digest.hexdigest()
+
+
+def probe_image(fp: BinaryIO, size: int, sha256: Optional[str] = None) -> ImageInfo:
+    """只读文件头获取格式和尺寸（Pillow 的 open 是惰性的，不解码像素）"""
+    fmt = sniff_image_format(fp.read(16))
+    fp.seek(0)
+    if fmt not in ALLOWED_FORMATS:
+        raise UnsupportedImageFormat(fmt)
+    from PIL import Image
+    try:
+        with Image.open(fp) as img:
+            width, height = img.size
+            detected = (img.format or "").lower()
+    except Exception as exc:
+        raise InvalidImage("cannot parse image header") from exc
+    finally:
+        fp.seek(0)
+    if detected != fmt:
+        raise InvalidImage("format mismatch")
+    return ImageInfo(format=fmt, width=width, height=height, size=size, sha256=sha256)
+
+
+def make_derivatives(src_path: str, specs=DERIVATIVE_SPECS, quality: int = DERIVATIVE_QUALITY) -> List[dict]:
+    """
+    在进程池中执行：按 specs 生成衍生图写入临时文件（调用方负责删除），
+    返回 [{"kind", "path", "width", "height", "bytes", "format"}]。
+    """
+    from PIL import Image, ImageOps
+    out = []
+    with Image.open(src_path) as src:
+        src = ImageOps.exif_transpose(src)
+        if src.mode not in ("RGB", "RGBA"):
+            src = src.convert("RGBA" if "A" in src.getbands() else "RGB")
+        for kind, max_side, fmt in specs:
+            img = src.copy()
+            if max_side:
+                img.thumbnail((max_side, max_side))
+            fd, path = tempfile.mkstemp(prefix=f"derived-{kind}-", suffix=f".{fmt.lower()}")
+            with os.fdopen(fd, "wb") as fh:
+                img.save(fh, fmt, quality=quality)
+            out.append({
+                "kind": kind,
+                "path": path,
+                "width": img.width,
+                "height": img.height,
+                "bytes": os.path.getsize(path),
+                "format": fmt.lower(),
+            })
+    return out
@@ -0,0 +1,321 @@
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("app.slow_query")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """固定桶直方图，按标签值分组；observe 可在线程池里调用"""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}  # 标签值 → [各桶计数..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for label_values, series in sorted(items):
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                le = _labels(self.labels, label_values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _labels(self.labels, label_values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {series[-1]}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labels, k)} {v:g}" for k, v in items)
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"),
+)
+http_request_db_queries = Histogram(
+    "http_request_db_queries", "SQL statements executed per request", ("method", "route"), QUERY_COUNT_BUCKETS,
+)
+http_request_db_duration = Histogram(
+    "http_request_db_seconds", "Time spent in SQL per request", ("method", "route"),
+)
+db_query_duration = Histogram("db_query_duration_seconds", "SQL statement latency")
+slow_queries = Counter("db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS")
+threadpool_wait = Histogram(
+    "threadpool_queue_wait_seconds", "Time a threadpool call waited before starting", ("name",),
+)
+threadpool_duration = Histogram(
+    "threadpool_call_duration_seconds", "Threadpool call run time (after it started)", ("name",),
+)
+query_budget_exceeded = Counter(
+    "http_query_budget_exceeded_total", "Requests that issued more SQL than QUERY_BUDGET_PER_REQUEST", ("route",),
+)
+
+REGISTRY = [
+    http_request_duration, http_request_db_queries, http_request_db_duration,
+    db_query_duration, slow_queries, threadpool_wait, threadpool_duration, query_budget_exceeded,
+]
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time", "threadpool_wait", "parent")
+
+    def __init__(self, parent: Optional["RequestStats"] = None):
+        self.queries = 0
+        self.db_time = 0.0
+        self.threadpool_wait = 0.0
+        self.parent = parent
+
+    def merge_into_parent(self) -> None:
+        if self.parent is not None:
+            self.parent.queries += self.queries
+            self.parent.db_time += self.db_time
+            self.parent.threadpool_wait += self.threadpool_wait
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+# ---- SQLAlchemy 引擎事件 ----
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["_query_started"].pop()
+    elapsed = time.perf_counter() - started
+    db_query_duration.observe(elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        slow_queries.inc()
+        slow_query_logger.warning("slow query %.1f ms: %s", elapsed * 1000, " ".join(statement.split())[:1000])
+
+
+def _handle_error(exception_context):
+    # 出错时 after_cursor_execute 不会触发，弹出对应的开始时间
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("_query_started"):
+        conn.info["_query_started"].pop()
+
+
+def instrument_engine(engine) -> None:
+    """给（异步）引擎挂上计时 / 计数事件；重复调用无副作用"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
+
+
+# ---- 线程池 ----
+
+async def run_in_threadpool_timed(name: str, fn: Callable, *args, **kwargs):
+    """run_in_threadpool 的计时版本：分别记录排队等待时间和执行时间"""
+    submitted = time.perf_counter()
+
+    def call():
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        return started - submitted, time.perf_counter() - started, result
+
+    waited, ran, result = await run_in_threadpool(call)
+    threadpool_wait.observe(waited, name)
+    threadpool_duration.observe(ran, name)
+    stats = _current.get()
+    if stats is not None:
+        stats.threadpool_wait += waited
+    return result
+
+
+# ---- 查询预算（N+1 检测） ----
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """
+    测试用：代码块（含其中经 ASGI 发出的请求）执行的 SQL 超过 limit 条时抛 QueryBudgetExceeded。
+
+        with assert_max_queries(3):
+            await client.get("/api/v1/fruits/")
+    """
+    stats = RequestStats(parent=_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        stats.merge_into_parent()
+    if stats.queries > limit:
+        raise QueryBudgetExceeded(f"expected at most {limit} queries, got {stats.queries}")
+
+
+# ---- ASGI 中间件 ----
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    纯 ASGI 中间件（不包装响应体）：记录每个路由的延迟、SQL 条数和耗时。
+    DEBUG 时加 Server-Timing 头；QUERY_BUDGET_STRICT 时超出查询预算直接抛错（测试环境用）。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats(parent=_current.get())
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+                self._check_budget(scope, stats)
+                if settings.DEBUG:
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    timing = (
+                        f'app;dur={elapsed_ms:.1f}, db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"'
+                    )
+                    if stats.threadpool_wait:
+                        timing += f', tpwait;dur={stats.threadpool_wait * 1000:.1f}'
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"server-timing", timing.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            stats.merge_into_parent()
+            elapsed = time.perf_counter() - started
+            route = _route_label(scope)
+            method = scope.get("method", "")
+            http_request_duration.observe(elapsed, method, route, str(status_holder["status"]))
+            http_request_db_queries.observe(stats.queries, method, route)
+            http_request_db_duration.observe(stats.db_time, method, route)
+
+    @staticmethod
+    def _check_budget(scope, stats: RequestStats) -> None:
+        budget = settings.QUERY_BUDGET_PER_REQUEST
+        if budget is None or stats.queries <= budget:
+            return
+        route = _route_label(scope)
+        query_budget_exceeded.inc(route)
+        message = f"{scope.get('method')} {route} issued {stats.queries} queries (budget {budget})"
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+# ---- /metrics 输出 ----
+
+def _gauges(prefix: str, rows: Iterable[Tuple[Dict[str, str], dict]]) -> List[str]:
+    """把 {指标: 数值} 形式的 stats 字典转成 gauge；非数值字段跳过"""
+    series: Dict[str, List[str]] = {}
+    for labels, stats in rows:
+        label_str = _labels(tuple(labels), tuple(labels.values()))
+        for key, value in stats.items():
+            if isinstance(value, bool):
+                value = int(value)
+            if isinstance(value, (int, float)):
+                series.setdefault(f"{prefix}_{key}", []).append(f"{prefix}_{key}{label_str} {value:g}")
+    lines = []
+    for name, values in series.items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(values)
+    return lines
+
+
+def render_metrics(extra_sources: Iterable[Tuple[str, Iterable[Tuple[Dict[str, str], dict]]]] = ()) -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for prefix, rows in extra_sources:
+        lines.extend(_gauges(prefix, rows))
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics() -> None:
+    for metric in REGISTRY:
+        metric.reset()
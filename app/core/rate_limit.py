@@ -0,0 +1,140 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from fastapi import HTTPException, Request
+from app.core.config import settings
+
+
+class RateLimitBackend:
+    """
+    限流计数后端接口。默认进程内实现；多 worker 部署可接入 Redis 等共享存储
+    （INCR 当前窗口 key、GET 上一窗口 key，过期时间设为两个窗口长度即可）。
+    """
+
+    async def incr(self, key: str, window_index: int) -> Tuple[int, int]:
+        """当前窗口计数 +1，返回 (当前窗口计数, 上一窗口计数)"""
+        raise NotImplementedError
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """每个 key 只存 [窗口序号, 当前计数, 上一窗口计数]；超过 maxsize 淘汰最久未访问的 key"""
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, list]" = OrderedDict()
+
+    async def incr(self, key: str, window_index: int) -> Tuple[int, int]:
+        entry = self._data.get(key)
+        if entry is None:
+            entry = [window_index, 0, 0]
+            self._data[key] = entry
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        else:
+            self._data.move_to_end(key)
+            if entry[0] != window_index:
+                # 只有紧邻的上一窗口参与加权，更早的计数直接丢弃
+                entry[2] = entry[1] if entry[0] == window_index - 1 else 0
+                entry[1] = 0
+                entry[0] = window_index
+        entry[1] += 1
+        return entry[1], entry[2]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """'次数/秒' → (limit, window)，如 '10/60'"""
+    limit, _, window = rate.partition("/")
+    return int(limit), int(window or 60)
+
+
+class SlidingWindowLimiter:
+    """
+    滑动窗口近似：上一固定窗口计数按剩余比例加权 + 当前窗口计数。
+    每次检查只做一次 O(1) 的计数更新。
+    """
+
+    def __init__(self, backend: RateLimitBackend):
+        self.backend = backend
+
+    async def hit(self, key: str, limit: int, window: int, now: Optional[float] = None) -> Optional[int]:
+        """记一次访问；未超限返回 None，超限返回建议的 Retry-After 秒数"""
+        now = time.time() if now is None else now
+        window_index = int(now // window)
+        elapsed = now - window_index * window
+        current, previous = await self.backend.incr(key, window_index)
+        weight = 1 - elapsed / window
+        if previous * weight + current <= limit:
+            return None
+        if current >= limit:
+            # 当前窗口已用满：等到下一窗口，且本窗口计数（届时的上一窗口）衰减出一次余量
+            wait = window - elapsed + window * (1 - (limit - 1) / current)
+        else:
+            # 等上一窗口的加权部分衰减到能再容纳一次
+            wait = (1 - (limit - current - 1) / previous) * window - elapsed
+        return max(1, math.ceil(wait))
+
+
+limiter = SlidingWindowLimiter(MemoryRateLimitBackend(maxsize=settings.RATE_LIMIT_MAX_KEYS))
+
+
+def set_rate_limit_backend(backend: RateLimitBackend) -> None:
+    """替换为共享存储后端，需在应用启动时调用"""
+    limiter.backend = backend
+
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def _request_email(request: Request) -> Optional[str]:
+    """邮箱可能在 query（forgot-password）或 JSON body（login / register）里"""
+    email = request.query_params.get("email")
+    if not email and request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if isinstance(body, dict) and isinstance(body.get("email"), str):
+            email = body["email"]
+    return email.strip().lower() if email else None
+
+
+def rate_limit(scope: str, ip: Optional[str] = None, email: Optional[str] = None):
+    """
+    生成限流依赖：ip / email 为 '次数/秒' 规则，分别按客户端 IP 和请求中的邮箱计数。
+    超限返回 429 并带 Retry-After。
+    """
+    ip_rule = parse_rate(ip) if ip else None
+    email_rule = parse_rate(email) if email else None
+
+    async def dependency(request: Request) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        checks = []
+        if ip_rule:
+            checks.append((f"{scope}:ip:{client_ip(request)}", *ip_rule))
+        if email_rule:
+            address = await _request_email(request)
+            if address:
+                checks.append((f"{scope}:email:{address}", *email_rule))
+        retry_after = 0
+        for key, limit, window in checks:
+            wait = await limiter.hit(key, limit, window)
+            if wait:
+                retry_after = max(retry_after, wait)
+        if retry_after:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please retry later",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+    return dependency
@@ -1,11 +1,40 @@
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional
+import hashlib
+import time
 import jwt
 from app.core.config import settings
 from jwt import PyJWTError
+from app.core.cache import TTLCache
+from app.core.executors import BoundedExecutor
 
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+_argon2_params = {
+    f"argon2__{name}": value
+    for name, value in (
+        ("time_cost", settings.ARGON2_TIME_COST),
+        ("memory_cost", settings.ARGON2_MEMORY_COST),
+        ("parallelism", settings.ARGON2_PARALLELISM),
+    )
+    if value is not None
+}
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """passlib / argon2 首次哈希（或预热）时才导入"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["argon2"], deprecated="auto", **_argon2_params)
+
+
+# argon2 计算会阻塞事件循环，统一放到有界执行池里跑
+hash_pool = BoundedExecutor(
+    "password_hash",
+    kind=settings.PASSWORD_HASH_EXECUTOR,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
@@ -13,17 +42,31 @@ REFRESH_TOKEN_EXPIRE_DAYS = 7  # ← 一定要加上
 SECRET_KEY = settings.SECRET_KEY
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def verify_password(password: str, hashed: str) -> bool:
-    return pwd_context.verify(password, hashed)
+    return get_pwd_context().verify(password, hashed)
+
+def verify_and_update_password(password: str, hashed: str):
+    """返回 (是否匹配, 新哈希或 None)；哈希参数过时时给出新哈希"""
+    return get_pwd_context().verify_and_update(password, hashed)
+
+async def hash_password_async(password: str) -> str:
+    return await hash_pool.run(hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await hash_pool.run(verify_password, password, hashed)
+
+async def verify_and_update_password_async(password: str, hashed: str):
+    return await hash_pool.run(verify_and_update_password, password, hashed)
 
 
 # JWT token
 def create_access_token(data: dict, expires_minutes: int = 30):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=expires_minutes)
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    expire = now + timedelta(minutes=expires_minutes)
+    to_encode.update({"exp": expire, "iat": now})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
 
 def create_password_reset_token(data: dict, expires_minutes: int = 30):
@@ -32,6 +75,10 @@ def create_password_reset_token(data: dict, expires_minutes: int = 30):
     to_encode.update({"exp": expire, "type": "reset"})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
 
+def hash_reset_token(token: str) -> str:
+    """重置 token 入库用的定长摘要"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
 def verify_password_reset_token(token: str):
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
@@ -44,6 +91,35 @@ def verify_password_reset_token(token: str):
 
 def create_refresh_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
-    to_encode.update({"exp": expire, "type": "refresh"})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
\ No newline at end of file
+    now = datetime.utcnow()
+    expire = now + (expires_delta or timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+    to_encode.update({"exp": expire, "iat": now, "type": "refresh"})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def decode_token(token: str) -> Optional[dict]:
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except PyJWTError:
+        return None
+
+
+# 已验证 token 的缓存：key 为签名段，value 为 (header.payload, payload)；TTL 不超过 token 剩余有效期
+_verified_tokens = TTLCache(maxsize=settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_TOKEN_CACHE_TTL)
+
+
+def verify_token(token: str, token_type: str = "access") -> Optional[dict]:
+    """校验签名和过期时间并检查 token 类型（access token 不带 type 字段）"""
+    signing_input, _, signature = token.rpartition(".")
+    cached = _verified_tokens.get(signature)
+    if cached is not None and cached[0] == signing_input:
+        payload = cached[1]
+    else:
+        payload = decode_token(token)
+        if payload is None:
+            return None
+        ttl = min(settings.AUTH_TOKEN_CACHE_TTL, payload.get("exp", 0) - time.time())
+        _verified_tokens.set(signature, (signing_input, payload), ttl=ttl)
+    if payload.get("type", "access") != token_type:
+        return None
+    return payload
\ No newline at end of file
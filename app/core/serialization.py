@@ -0,0 +1,26 @@
+import json
+from datetime import date, datetime
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 是可选加速
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_dumps(obj) -> bytes:
+    """紧凑 JSON（UTF-8、不转义非 ASCII），输出格式与 Pydantic model_dump_json 一致"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
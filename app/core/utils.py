@@ -0,0 +1,53 @@
+import base64
+import json
+from typing import Any, AsyncIterator, List, Optional
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """把排序键值编码成不透明的 url-safe 游标字符串"""
+    raw = json.dumps(values, ensure_ascii=False, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """解析 encode_cursor 生成的游标；格式不对时抛 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except Exception as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(values, list):
+        raise ValueError("invalid cursor")
+    return values
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Optional[bytes]]:
+    """
+    把字节流按 \\n 切成行（去掉行尾 \\r\\n），只缓冲当前这一行。
+    超过 max_line_bytes 的行丢弃其内容、产出 None，由调用方按行报错。
+    """
+    buffer = bytearray()
+    oversized = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                if not oversized:
+                    buffer += chunk[start:]
+                    if len(buffer) > max_line_bytes:
+                        oversized = True
+                        buffer.clear()
+                break
+            if oversized or len(buffer) + end - start > max_line_bytes:
+                yield None
+            else:
+                buffer += chunk[start:end]
+                yield bytes(buffer).rstrip(b"\r")
+            buffer.clear()
+            oversized = False
+            start = end + 1
+    if oversized:
+        yield None
+    elif buffer:
+        yield bytes(buffer).rstrip(b"\r")
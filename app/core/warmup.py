@@ -0,0 +1,69 @@
+import asyncio
+import importlib
+import logging
+import time
+from typing import Callable, Dict, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _cloudinary():
+    from app.core.cloudinary_client import get_uploader
+    get_uploader()
+
+
+def _password_hashing():
+    from app.core.security import get_pwd_context
+    # 加载 argon2 backend，但不做真正的哈希计算
+    get_pwd_context().handler("argon2").get_backend()
+
+
+# 启动时不导入的重型依赖，服务开始接收请求后在线程里预先加载
+WARMUP_STEPS: Tuple[Tuple[str, Callable[[], object]], ...] = (
+    ("cloudinary", _cloudinary),
+    ("password_hashing", _password_hashing),
+    ("aiosmtplib", lambda: importlib.import_module("aiosmtplib")),
+    ("pillow", lambda: importlib.import_module("PIL.Image")),
+)
+
+_task: Optional[asyncio.Task] = None
+
+
+def run_warmup_steps() -> Dict[str, float]:
+    """依次执行预热步骤，返回各步骤耗时（毫秒）；单步失败只记录日志"""
+    timings = {}
+    for name, step in WARMUP_STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.warning("warm-up step %s failed", name, exc_info=True)
+            continue
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    return timings
+
+
+async def warm_up(delay: float = 0.0) -> Dict[str, float]:
+    # 启动钩子返回后 uvicorn 才开始监听，等一小段时间再加载，不占冷启动时间
+    await asyncio.sleep(delay)
+    timings = await asyncio.to_thread(run_warmup_steps)
+    logger.info("warm-up finished: %s", timings)
+    return timings
+
+
+def start_warm_up() -> None:
+    global _task
+    if settings.WARMUP_ENABLED and _task is None:
+        _task = asyncio.create_task(warm_up(settings.WARMUP_DELAY), name="warm-up")
+
+
+async def stop_warm_up() -> None:
+    global _task
+    if _task is not None and not _task.done():
+        _task.cancel()
+        try:
+            await _task
+        except (asyncio.CancelledError, Exception):
+            pass
+    _task = None
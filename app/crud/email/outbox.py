@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.email import EmailOutbox, OUTBOX_PENDING, OUTBOX_SENT, OUTBOX_FAILED
+
+
+def enqueue_email(db: AsyncSession, to_email: str, subject: str, body: str) -> EmailOutbox:
+    """只加入会话不提交：由调用方和业务数据在同一事务里提交"""
+    item = EmailOutbox(to_email=to_email, subject=subject, body=body, status=OUTBOX_PENDING)
+    db.add(item)
+    return item
+
+
+async def claim_batch(db: AsyncSession, limit: int, lease_seconds: float) -> List[EmailOutbox]:
+    """
+    领取一批到期的待发邮件：FOR UPDATE SKIP LOCKED 避免多个 worker 抢同一行，
+    领取后把 next_attempt_at 顺延一个租约并提交，发送期间不持有行锁和连接。
+    """
+    now = datetime.utcnow()
+    rows = (await db.execute(
+        select(EmailOutbox)
+        .where(EmailOutbox.status == OUTBOX_PENDING, EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )).scalars().all()
+    lease_until = now + timedelta(seconds=lease_seconds)
+    for item in rows:
+        item.attempts = (item.attempts or 0) + 1
+        item.next_attempt_at = lease_until
+    await db.commit()
+    return rows
+
+
+async def mark_sent(db: AsyncSession, ids: List[int]) -> None:
+    if not ids:
+        return
+    # 正文可能含重置链接等敏感内容，发出后清空，只保留收件人 / 主题等投递记录
+    await db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(ids))
+        .values(status=OUTBOX_SENT, sent_at=datetime.utcnow(), last_error=None, body="")
+    )
+
+
+async def mark_retry(db: AsyncSession, item_id: int, error: str, delay_seconds: Optional[float]) -> None:
+    """delay_seconds 为 None 表示不再重试（永久失败或次数用尽）"""
+    values = {"last_error": error[:2000]}
+    if delay_seconds is None:
+        values["status"] = OUTBOX_FAILED
+    else:
+        values["next_attempt_at"] = datetime.utcnow() + timedelta(seconds=delay_seconds)
+    await db.execute(update(EmailOutbox).where(EmailOutbox.id == item_id).values(**values))
+
+
+async def pending_count(db: AsyncSession) -> int:
+    q = await db.execute(select(func.count()).select_from(EmailOutbox).where(EmailOutbox.status == OUTBOX_PENDING))
+    return q.scalar() or 0
+
+
+async def purge_finished_emails(db: AsyncSession, older_than: datetime, batch_size: int = 1000) -> int:
+    """
+    按批删除 older_than 之前已发送（sent_at）或已放弃（最后一次领取的 next_attempt_at）的邮件，
+    每批单独提交，避免长事务和大范围锁
+    """
+    total = 0
+    while True:
+        finished = (
+            select(EmailOutbox.id)
+            .where(
+                EmailOutbox.status.in_((OUTBOX_SENT, OUTBOX_FAILED)),
+                func.coalesce(EmailOutbox.sent_at, EmailOutbox.next_attempt_at) <= older_than,
+            )
+            .limit(batch_size)
+        )
+        result = await db.execute(delete(EmailOutbox).where(EmailOutbox.id.in_(finished.scalar_subquery())))
+        await db.commit()
+        total += result.rowcount or 0
+        if (result.rowcount or 0) < batch_size:
+            return total
@@ -0,0 +1,64 @@
+import hashlib
+import json
+from typing import Iterable, Optional
+from app.core.cache import CacheBackend, CachedResponse, MemoryCacheBackend, ResponseCache
+from app.core.config import settings
+from app.db.session import db_manager
+
+# 详情按 id 精确失效；列表 key 带“代号”，任何写入都会让代号 +1，旧列表整体失效。
+# 详情回填也以该代号为准：查库前记下代号，查完若已变化（期间有写入）则不回填，
+# 避免“读到旧行 → 写入并删除缓存 → 旧行写回缓存”留下过期详情
+LIST_GENERATION_KEY = "fruits:list:generation"
+
+
+def local_cache_ttl(ttl: float) -> float:
+    """
+    进程内缓存的 TTL：写入只能让本 worker 的缓存失效，多 worker 时
+    截断到 FRUIT_CACHE_MULTI_WORKER_TTL，作为其他 worker 读到旧数据的时间上限
+    """
+    if settings.WEB_CONCURRENCY > 1:
+        return min(ttl, settings.FRUIT_CACHE_MULTI_WORKER_TTL)
+    return ttl
+
+
+fruit_cache = ResponseCache(
+    MemoryCacheBackend(maxsize=settings.FRUIT_CACHE_SIZE, ttl=local_cache_ttl(settings.FRUIT_CACHE_TTL)),
+    ttl=local_cache_ttl(settings.FRUIT_CACHE_TTL),
+)
+
+
+def set_fruit_cache_backend(backend: CacheBackend) -> None:
+    """替换为共享缓存后端（如 Redis），需在应用启动时调用；失效对所有 worker 生效，恢复完整 TTL"""
+    fruit_cache.backend = backend
+    fruit_cache.ttl = settings.FRUIT_CACHE_TTL
+
+
+def detail_key(fruit_id: str) -> str:
+    return f"fruits:detail:{fruit_id}"
+
+
+async def write_generation() -> int:
+    """查库前调用，结果传给 set_detail"""
+    return await fruit_cache.backend.counter(LIST_GENERATION_KEY)
+
+
+async def set_detail(fruit_id: str, body: bytes, generation: int) -> CachedResponse:
+    """回填详情缓存；generation 之后有过写入时只返回响应，不写缓存"""
+    if await fruit_cache.backend.counter(LIST_GENERATION_KEY) != generation:
+        return CachedResponse(body)
+    return await fruit_cache.set(detail_key(fruit_id), body)
+
+
+async def list_key(params: dict) -> str:
+    generation = await fruit_cache.backend.counter(LIST_GENERATION_KEY)
+    normalized = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+    return f"fruits:list:{generation}:{digest}"
+
+
+async def invalidate_fruit_responses(ids: Optional[Iterable[str]] = None) -> None:
+    # 副本追上之前本进程的读走主库，避免把旧数据重新写进缓存
+    db_manager.note_write()
+    if ids:
+        await fruit_cache.delete(*(detail_key(i) for i in ids))
+    await fruit_cache.backend.incr(LIST_GENERATION_KEY)
@@ -1,95 +1,667 @@
-from typing import List, Tuple, Optional
+import json
+import operator
+from typing import AsyncIterator, Dict, Iterable, List, Mapping, Sequence, Tuple, Optional
+from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, asc, desc, delete
+from sqlalchemy import select, insert, update, or_, and_, asc, desc, delete, tuple_, text, case, false, cast, literal_column, type_coerce, DateTime, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
-from app.db.models.fruit import Fruit as FruitModel
+from app.db.models.fruit import (
+    Fruit as FruitModel, FruitTag, TAG_KINDS, TAG_VALUE_MAX_LENGTH, NUTRITION_COLUMNS, nutrition_values,
+)
+from app.core.cache import SingleFlight, TTLCache
+from app.core.config import settings
+from app.core.utils import encode_cursor, decode_cursor
+from app.crud.fruit.cache import invalidate_fruit_responses, local_cache_ttl
+from app.crud.fruit.image_asset import add_image_refs, image_ref_counts, release_image_refs
+from app.crud.fruit.search import ngram_index, resolve_search_mode, substring_clause, trigram_rank
 
+# 允许排序 / 游标分页的字段（营养字段为 nutritional_value 的冗余列）
+SORTABLE_FIELDS = {"name_cn", "created_at", "updated_at", "id", *NUTRITION_COLUMNS}
+DEFAULT_SORT = "name_cn:asc"
+# 按搜索相关度排序（仅在传入 q 时有效，不支持游标分页）
+RELEVANCE_SORT = "relevance"
 
-async def get_fruit(db: AsyncSession, fruit_id: str) -> Optional[FruitModel]:
-    q = await db.execute(select(FruitModel).where(FruitModel.id == fruit_id))
-    return q.scalars().first()
+# total 统计方式：exact 每次 count；cached 按筛选条件缓存；estimate 用 PG 统计信息估算；none 不统计
+COUNT_MODES = ("exact", "cached", "estimate", "none")
 
+# 营养字段范围筛选：查询参数形如 calories_kcal_lt=50
+RANGE_OPERATORS = {"lt": operator.lt, "lte": operator.le, "gt": operator.gt, "gte": operator.ge}
 
-async def list_fruits(db: AsyncSession, page: int = 1, per_page: int = 20,
-                      q: str = None, origin: str = None, season: str = None,
-                      sort_by: str = "name_cn:asc") -> Tuple[List[FruitModel], int]:
-    stmt = select(FruitModel)
+# 进程内缓存，多 worker 时 TTL 受 FRUIT_CACHE_MULTI_WORKER_TTL 限制
+_count_cache = TTLCache(maxsize=settings.FRUIT_COUNT_CACHE_SIZE, ttl=local_cache_ttl(settings.FRUIT_COUNT_CACHE_TTL))
+# 并发的相同单条查询共享一次数据库往返
+fruit_lookups = SingleFlight()
+
+
+def invalidate_count_cache() -> None:
+    _count_cache.clear()
+
+
+async def invalidate_fruit_caches(ids: Optional[Iterable[str]] = None) -> None:
+    """所有写路径提交后调用：清 count 缓存、失效对应详情与全部列表响应"""
+    invalidate_count_cache()
+    await invalidate_fruit_responses(ids)
+
+
+def _images_head(limit: int):
+    """PG 上在库内只取 images 前 N 项（jsonpath 下标越界在 lax 模式下会被忽略）"""
+    path = literal_column(f"'$[0 to {int(limit) - 1}]'::jsonpath")
+    return type_coerce(func.jsonb_path_query_array(cast(FruitModel.images, JSONB), path), JSON).label("images")
+
+
+def _select_fruits(columns: Optional[Sequence[str]] = None, *required: str, images_limit: Optional[int] = None):
+    """
+    不传 columns 时取 ORM 对象；传入列名时只取这些列，结果是 Row（支持属性访问）。
+    images_limit 仅对 Row 生效，由调用方确认数据库支持（PG）。
+    """
+    if columns is None:
+        return select(FruitModel)
+    table = FruitModel.__table__
+    selected = []
+    for name in dict.fromkeys([*columns, *required]):
+        if name == "images" and images_limit:
+            selected.append(_images_head(images_limit))
+        else:
+            selected.append(table.c[name])
+    return select(*selected)
+
+
+def _fetch(result, columns: Optional[Sequence[str]]):
+    return result.scalars().all() if columns is None else result.all()
+
+
+async def get_fruit(db: AsyncSession, fruit_id: str, columns: Optional[Sequence[str]] = None,
+                    coalesce: bool = False):
+    """
+    coalesce=True 时与同一数据库上并发的相同查询合并（singleflight），只用于只读场景：
+    合并后拿到的 ORM 对象属于发起查询的那个会话，不要修改。
+    """
+    async def load():
+        q = await db.execute(_select_fruits(columns).where(FruitModel.id == fruit_id))
+        return q.scalars().first() if columns is None else q.first()
+
+    if not coalesce:
+        return await load()
+    key = (str(db.get_bind().url), fruit_id, tuple(columns) if columns is not None else None)
+    return await fruit_lookups.do(key, load)
+
+
+async def get_fruits_by_ids(db: AsyncSession, ids: List[str], columns: Optional[Sequence[str]] = None) -> dict:
+    """一次 IN 查询按 id 取多条，返回 {id: Fruit}；传入 columns 时值为只含这些列的 Row"""
+    if not ids:
+        return {}
+    q = await db.execute(
+        _select_fruits(columns, "id").where(FruitModel.id.in_(list(dict.fromkeys(ids))))
+    )
+    return {o.id: o for o in _fetch(q, columns)}
+
+
+def _parse_sort(sort_by: Optional[str]) -> Tuple[str, bool]:
+    """返回 (字段名, 是否降序)，无法识别时回退到默认排序"""
+    try:
+        field, direction = (sort_by or DEFAULT_SORT).split(":")
+    except ValueError:
+        field, direction = DEFAULT_SORT.split(":")
+    if field not in SORTABLE_FIELDS or direction not in ("asc", "desc"):
+        field, direction = DEFAULT_SORT.split(":")
+    return field, direction == "desc"
+
+
+def _order_by(field: str, descending: bool):
+    # NULL 一律视为最大值（与 PG 默认一致），并以 id 兜底保证顺序稳定
+    column = getattr(FruitModel, field)
+    if descending:
+        return [desc(column).nulls_first(), desc(FruitModel.id)]
+    return [asc(column).nulls_last(), asc(FruitModel.id)]
+
+
+def _cursor_value(field: str, value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _seek_clause(field: str, descending: bool, value, last_id: str):
+    """WHERE (col, id) > (value, last_id) 的 keyset 条件（含 NULL 处理）"""
+    column = getattr(FruitModel, field)
+    if value is not None and isinstance(column.type, DateTime):
+        value = datetime.fromisoformat(value)
+    nullable = column.nullable and field != "id"
+    if value is None:
+        if descending:
+            return or_(and_(column.is_(None), FruitModel.id < last_id), column.isnot(None))
+        return and_(column.is_(None), FruitModel.id > last_id)
+    if descending:
+        return tuple_(column, FruitModel.id) < tuple_(value, last_id)
+    seek = tuple_(column, FruitModel.id) > tuple_(value, last_id)
+    return or_(seek, column.is_(None)) if nullable else seek
+
+
+def parse_nutrition_ranges(params: Mapping[str, str]) -> Tuple[Tuple[str, str, float], ...]:
+    """
+    从查询参数中取出 <营养字段>_<lt|lte|gt|gte>=数值，返回排好序的 (字段, 运算符, 值)，
+    其他参数忽略；数值无效时抛 ValueError。
+    """
+    ranges = []
+    for key, value in params.items():
+        field, _, op = key.rpartition("_")
+        if field not in NUTRITION_COLUMNS or op not in RANGE_OPERATORS:
+            continue
+        try:
+            ranges.append((field, op, float(value)))
+        except ValueError:
+            raise ValueError(f"{key} must be a number")
+    return tuple(sorted(ranges))
+
+
+def _filter_signature(q, origin, season, search_mode, ranges=()) -> tuple:
+    return (q or "", origin or "", season or "", search_mode if q else "", tuple(ranges))
+
+
+async def _count(db: AsyncSession, stmt, signature: tuple, mode: str) -> Optional[int]:
+    if mode == "none":
+        return None
+    if mode == "estimate" and not any(signature[:3]) and not signature[4] and db.get_bind().dialect.name == "postgresql":
+        # 无筛选条件时直接读 pg_class.reltuples，不扫表
+        res = await db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:t AS regclass)"),
+            {"t": FruitModel.__tablename__},
+        )
+        estimate = res.scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    if mode in ("cached", "estimate"):
+        cached = _count_cache.get(signature)
+        if cached is not None:
+            return cached
+    total_q = await db.execute(select(func.count()).select_from(stmt.subquery()))
+    total = total_q.scalar() or 0
+    if mode in ("cached", "estimate"):
+        _count_cache.set(signature, total)
+    return total
+
+
+def _tag_filter(kind: str, value: str):
+    return FruitModel.id.in_(
+        select(FruitTag.fruit_id).where(FruitTag.kind == kind, FruitTag.value == value)
+    )
+
+
+async def _apply_filters(db: AsyncSession, stmt, q: Optional[str], origin: Optional[str],
+                         season: Optional[str], search_mode: str, ranges: Sequence[Tuple[str, str, float]] = ()):
+    """给 stmt 加上 q / origin / season / 营养范围条件，返回 (stmt, 相关度表达式或 None)"""
+    rank = None
     if q:
-        like = f"%{q}%"
-        stmt = stmt.where(or_(FruitModel.name_cn.ilike(like), FruitModel.description.ilike(like)))
+        if search_mode == "ngram":
+            await ngram_index.ensure_loaded(db)
+            hits = ngram_index.search(q)
+            if hits:
+                stmt = stmt.where(FruitModel.id.in_([doc_id for doc_id, _ in hits]))
+                rank = case({doc_id: score for doc_id, score in hits}, value=FruitModel.id, else_=0)
+            else:
+                stmt = stmt.where(false())
+        else:
+            stmt = stmt.where(substring_clause(q))
+            if search_mode == "trigram":
+                rank = trigram_rank(q)
     if origin:
-        stmt = stmt.where(FruitModel.origin.contains([origin]))
+        stmt = stmt.where(_tag_filter("origin", origin))
     if season:
-        stmt = stmt.where(FruitModel.season.contains([season]))
+        stmt = stmt.where(_tag_filter("season", season))
+    for field, op, value in ranges:
+        # NULL 不满足任何比较，缺该营养数据的水果被排除
+        stmt = stmt.where(RANGE_OPERATORS[op](getattr(FruitModel, field), value))
+    return stmt, rank
+
+
+async def list_fruits(db: AsyncSession, page: int = 1, per_page: int = 20,
+                      q: str = None, origin: str = None, season: str = None,
+                      sort_by: str = None, cursor: str = None,
+                      count: str = "exact", search_mode: str = "auto",
+                      columns: Optional[Sequence[str]] = None, images_limit: Optional[int] = None,
+                      ranges: Sequence[Tuple[str, str, float]] = (),
+                      ) -> Tuple[list, Optional[int], Optional[str]]:
+    """
+    返回 (items, total, next_cursor)。
+    传入 cursor 时使用 keyset 分页（忽略 page），否则使用 OFFSET 分页。
+    传入 columns 时 items 为只含这些列的 Row，不构造 ORM 对象；
+    images_limit 在 PG 上于库内截断 images，其他数据库由调用方截断。
+    ranges 为 parse_nutrition_ranges 的结果，走各营养列上的 (列, id) 索引。
+    未指定 sort_by 且有 q 时按相关度排序。
+    参数无效（cursor 与 sort_by 不匹配等）时抛 ValueError。
+    """
+    if count not in COUNT_MODES:
+        raise ValueError(f"count must be one of {', '.join(COUNT_MODES)}")
+    search_mode = resolve_search_mode(db, search_mode)
+    if sort_by is None:
+        sort_by = RELEVANCE_SORT if q and search_mode != "substring" else DEFAULT_SORT
+    relevance = sort_by == RELEVANCE_SORT and bool(q)
+
+    field, descending = _parse_sort(sort_by)
+    if db.get_bind().dialect.name != "postgresql":
+        images_limit = None
+    base = _select_fruits(columns, field, "id", images_limit=images_limit)
+    stmt, rank = await _apply_filters(db, base, q, origin, season, search_mode, ranges)
+
+    total = await _count(db, stmt, _filter_signature(q, origin, season, search_mode, ranges), count)
 
     # sorting
-    if sort_by:
-        try:
-            field, direction = sort_by.split(":")
-            column = getattr(FruitModel, field, None)
-            if column is not None:
-                stmt = stmt.order_by(asc(column) if direction == "asc" else desc(column))
-        except Exception:
-            pass
+    if relevance and rank is not None:
+        if cursor:
+            raise ValueError("cursor pagination is not supported with relevance sort")
+        page_stmt = stmt.order_by(desc(rank), asc(FruitModel.id)).offset((page - 1) * per_page)
+        items_q = await db.execute(page_stmt.limit(per_page))
+        return _fetch(items_q, columns), total, None
+
+    page_stmt = stmt.order_by(*_order_by(field, descending))
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 4 or values[0] != field or values[1] != ("desc" if descending else "asc"):
+            raise ValueError("cursor does not match sort_by")
+        page_stmt = page_stmt.where(_seek_clause(field, descending, values[2], values[3]))
+    else:
+        page_stmt = page_stmt.offset((page - 1) * per_page)
+
+    # 多取一行用于判断是否还有下一页
+    items_q = await db.execute(page_stmt.limit(per_page + 1))
+    items = _fetch(items_q, columns)
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor([field, "desc" if descending else "asc",
+                                     _cursor_value(field, getattr(last, field)), last.id])
+    return items, total, next_cursor
+
+
+async def fruit_facets(db: AsyncSession, q: str = None, origin: str = None, season: str = None,
+                       search_mode: str = "auto") -> Dict[str, Dict[str, int]]:
+    """当前筛选条件下每个 origin / season 值的水果数，一次 GROUP BY 查询"""
+    search_mode = resolve_search_mode(db, search_mode)
+    stmt = select(FruitTag.kind, FruitTag.value, func.count()).group_by(FruitTag.kind, FruitTag.value)
+    if q or origin or season:
+        ids, _ = await _apply_filters(db, select(FruitModel.id), q, origin, season, search_mode)
+        stmt = stmt.where(FruitTag.fruit_id.in_(ids))
+    facets: Dict[str, Dict[str, int]] = {kind: {} for kind in TAG_KINDS}
+    for kind, value, n in await db.execute(stmt):
+        facets.setdefault(kind, {})[value] = n
+    return facets
+
+
+def _tag_rows(fruit_id: str, data) -> List[dict]:
+    rows = []
+    for kind in TAG_KINDS:
+        values = data.get(kind) if isinstance(data, dict) else getattr(data, kind, None)
+        for value in dict.fromkeys(values or []):
+            # 接口已限制长度；旧数据里超长的值不建标签（不参与筛选 / 分面），避免写入失败
+            if value and len(value) <= TAG_VALUE_MAX_LENGTH:
+                rows.append({"fruit_id": fruit_id, "kind": kind, "value": value})
+    return rows
+
+
+async def _replace_tags(db: AsyncSession, objs: List[FruitModel]) -> None:
+    """按 Fruit 当前的 origin / season 重写标签行（与调用方同一事务）"""
+    if not objs:
+        return
+    await db.execute(delete(FruitTag).where(FruitTag.fruit_id.in_([o.id for o in objs])))
+    rows = [row for o in objs for row in _tag_rows(o.id, o)]
+    if rows:
+        await db.execute(insert(FruitTag), rows)
+
+
+async def backfill_fruit_tags(db: AsyncSession) -> int:
+    """为还没有标签行的水果补齐标签（启动时调用，用于从旧表结构升级）"""
+    missing = (await db.execute(
+        select(FruitModel).where(~FruitModel.id.in_(select(FruitTag.fruit_id)))
+    )).scalars().all()
+    rows = [row for o in missing for row in _tag_rows(o.id, o)]
+    if rows:
+        await db.execute(insert(FruitTag), rows)
+        await db.commit()
+    return len(rows)
 
-    total_q = await db.execute(select(func.count()).select_from(stmt.subquery()))
-    total = total_q.scalar() or 0
 
-    items_q = await db.execute(stmt.offset((page - 1) * per_page).limit(per_page))
-    items = items_q.scalars().all()
-    return items, total
+async def backfill_nutrition_columns(db: AsyncSession, batch_size: int = 500) -> int:
+    """营养列全为空但 JSON 有值的行补齐营养列（启动时在 upgrade_schema 加列之后调用，用于从旧表结构升级）"""
+    filled, last_id = 0, ""
+    while True:
+        rows = (await db.execute(
+            select(FruitModel.id, FruitModel.nutritional_value)
+            .where(FruitModel.id > last_id, FruitModel.nutritional_value.isnot(None),
+                   *(getattr(FruitModel, name).is_(None) for name in NUTRITION_COLUMNS))
+            .order_by(FruitModel.id)
+            .limit(batch_size)
+        )).all()
+        if not rows:
+            return filled
+        last_id = rows[-1].id
+        updates = [{"id": fid, **nutrition_values(value)} for fid, value in rows]
+        updates = [u for u in updates if any(u[name] is not None for name in NUTRITION_COLUMNS)]
+        if updates:
+            await db.execute(update(FruitModel), updates)
+            await db.commit()
+            filled += len(updates)
 
 
 async def create_fruit(db: AsyncSession, data: dict) -> FruitModel:
     obj = FruitModel(**data)
     db.add(obj)
+    await db.flush()
+    tags = _tag_rows(obj.id, obj)
+    if tags:
+        await db.execute(insert(FruitTag), tags)
+    # images 里带了已登记的图片时同样计入引用，否则删除另一处时会误删远端资源
+    await add_image_refs(db, image_ref_counts([obj.images]))
     await db.commit()
     await db.refresh(obj)
+    await invalidate_fruit_caches()
+    ngram_index.sync([obj])
     return obj
 
 
-async def bulk_create(db: AsyncSession, items: List[dict]) -> List[FruitModel]:
-    objs = [FruitModel(**i) for i in items]
-    db.add_all(objs)
+def _chunks(items: List[dict], size: int):
+    for start in range(0, len(items), size):
+        yield start, items[start:start + size]
+
+
+def _with_nutrition(item: dict) -> dict:
+    """批量 INSERT / COPY 不经过 ORM 属性赋值（@validates 不触发），营养列在这里补上"""
+    return {**item, **nutrition_values(item.get("nutritional_value"))}
+
+
+async def bulk_create(db: AsyncSession, items: List[dict], chunk_size: int = None) -> List[FruitModel]:
+    """分块 INSERT ... RETURNING：每块一条语句拿回 id / created_at / updated_at，不再逐个 refresh"""
+    chunk_size = chunk_size or settings.BULK_INSERT_CHUNK_SIZE
+    items = [_with_nutrition(i) for i in items]
+    objs: List[FruitModel] = []
+    for _, chunk in _chunks(items, chunk_size):
+        res = await db.scalars(
+            insert(FruitModel).returning(FruitModel, sort_by_parameter_order=True), chunk
+        )
+        created = res.all()
+        tags = [row for o in created for row in _tag_rows(o.id, o)]
+        if tags:
+            await db.execute(insert(FruitTag), tags)
+        await add_image_refs(db, image_ref_counts(o.images for o in created))
+        objs.extend(created)
     await db.commit()
-    # refresh each
-    for o in objs:
-        await db.refresh(o)
+    await invalidate_fruit_caches()
+    ngram_index.sync(objs)
     return objs
 
 
-async def bulk_delete(db: AsyncSession, ids: List[str]) -> int:
+def _row_with_defaults(table, data: dict) -> dict:
+    """COPY 不会触发 Python 端的列默认值，这里手动补齐"""
+    row = {}
+    for column in table.columns:
+        if column.name in data:
+            row[column.name] = data[column.name]
+        elif column.default is not None:
+            default = column.default
+            row[column.name] = default.arg(None) if default.is_callable else default.arg
+        else:
+            row[column.name] = None
+    return row
+
+
+async def _copy_rows(db: AsyncSession, table, rows: List[dict]) -> None:
+    """asyncpg 二进制 COPY；JSON 列需要以字符串传给驱动"""
+    columns = [c.name for c in table.columns]
+    json_columns = {c.name for c in table.columns if isinstance(c.type, JSON)}
+    records = [
+        tuple(json.dumps(r[c], ensure_ascii=False) if c in json_columns and r[c] is not None else r[c]
+              for c in columns)
+        for r in rows
+    ]
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(table.name, records=records, columns=columns)
+
+
+async def _insert_rows(db: AsyncSession, rows: List[dict], use_copy: bool) -> None:
+    """写入已补齐默认值的行、标签行和图片引用（调用方负责事务 / SAVEPOINT）"""
+    tags = [t for r in rows for t in _tag_rows(r["id"], r)]
+    if use_copy:
+        await _copy_rows(db, FruitModel.__table__, rows)
+        if tags:
+            await _copy_rows(db, FruitTag.__table__, tags)
+    else:
+        await db.execute(insert(FruitModel), rows)
+        if tags:
+            await db.execute(insert(FruitTag), tags)
+    await add_image_refs(db, image_ref_counts(r["images"] for r in rows))
+
+
+async def bulk_create_copy(db: AsyncSession, items: List[dict], chunk_size: int = None) -> dict:
+    """
+    大批量导入：每块在独立 SAVEPOINT 内写入，失败只回滚该块，返回逐块报告。
+    asyncpg 驱动下走 COPY，其他驱动退化为分块 INSERT。
+    """
+    chunk_size = chunk_size or settings.BULK_COPY_CHUNK_SIZE
+    use_copy = db.get_bind().dialect.driver == "asyncpg"
+    chunks = []
+    created_rows: List[dict] = []
+    for index, (offset, chunk) in enumerate(_chunks(items, chunk_size)):
+        rows = [_row_with_defaults(FruitModel.__table__, _with_nutrition(i)) for i in chunk]
+        try:
+            async with db.begin_nested():
+                await _insert_rows(db, rows, use_copy)
+        except Exception as exc:
+            chunks.append({"index": index, "offset": offset, "count": len(chunk), "ok": False,
+                           "error": str(exc), "ids": []})
+            continue
+        created_rows.extend(rows)
+        chunks.append({"index": index, "offset": offset, "count": len(chunk), "ok": True,
+                       "error": None, "ids": [r["id"] for r in rows]})
+    await db.commit()
+    await invalidate_fruit_caches()
+    ngram_index.sync_rows(created_rows)
+    return {
+        "mode": "copy" if use_copy else "insert",
+        "total": len(items),
+        "inserted": len(created_rows),
+        "failed": len(items) - len(created_rows),
+        "chunks": chunks,
+    }
+
+
+async def import_chunk(db: AsyncSession, items: List[dict]) -> Tuple[List[str], List[Tuple[int, str]]]:
+    """
+    流式导入的一块：整块写入并提交；整块失败时逐行在 SAVEPOINT 内重试，定位出错的行。
+    返回 (写入的 id, [(块内下标, 错误信息)])。
+    """
+    use_copy = db.get_bind().dialect.driver == "asyncpg"
+    rows = [_row_with_defaults(FruitModel.__table__, _with_nutrition(i)) for i in items]
+    errors: List[Tuple[int, str]] = []
+    try:
+        async with db.begin_nested():
+            await _insert_rows(db, rows, use_copy)
+        created = rows
+    except Exception:
+        created = []
+        for index, row in enumerate(rows):
+            try:
+                async with db.begin_nested():
+                    await _insert_rows(db, [row], use_copy=False)
+            except Exception as exc:
+                errors.append((index, str(getattr(exc, "orig", None) or exc)))
+                continue
+            created.append(row)
+    await db.commit()
+    if created:
+        await invalidate_fruit_caches()
+        ngram_index.sync_rows(created)
+    return [r["id"] for r in created], errors
+
+
+async def stream_fruits(db: AsyncSession, columns: Sequence[str], origin: Optional[str] = None,
+                        season: Optional[str] = None, batch_size: int = None) -> AsyncIterator[list]:
+    """
+    按 id 顺序流式读出全部（筛选后的）水果：服务端游标 + yield_per，
+    每次产出最多 batch_size 条 Row，内存占用与总行数无关。
+    """
+    batch_size = batch_size or settings.FRUIT_EXPORT_BATCH_SIZE
+    stmt, _ = await _apply_filters(db, _select_fruits(columns), None, origin, season, "substring")
+    result = await db.stream(stmt.order_by(asc(FruitModel.id)).execution_options(yield_per=batch_size))
+    try:
+        async for rows in result.partitions():
+            yield rows
+    finally:
+        await result.close()
+
+
+# images 非数组（SQL NULL 或 JSON null）时按空数组处理
+_IMAGES_ARRAY = {
+    "postgresql": "(CASE WHEN jsonb_typeof(fruits.images::jsonb) = 'array' THEN fruits.images::jsonb ELSE '[]'::jsonb END)",
+    "sqlite": "(CASE WHEN json_type(fruits.images) = 'array' THEN fruits.images ELSE '[]' END)",
+}
+
+
+def _images_appended(dialect: str, images: List[dict]):
+    """在库内把 images 追加到数组末尾的表达式；不支持的数据库返回 None"""
+    if dialect == "postgresql":
+        return text(f"({_IMAGES_ARRAY[dialect]} || CAST(:new_images AS jsonb))::json").bindparams(
+            new_images=json.dumps(images, ensure_ascii=False),
+        )
+    if dialect == "sqlite":
+        placeholders = ", ".join(f"'$[#]', json(:image_{i})" for i in range(len(images)))
+        return text(f"json_insert({_IMAGES_ARRAY[dialect]}, {placeholders})").bindparams(
+            **{f"image_{i}": json.dumps(img, ensure_ascii=False) for i, img in enumerate(images)}
+        )
+    return None
+
+
+def _images_without(dialect: str, public_id: str):
+    """在库内去掉 public_id 匹配的图片、保持其余顺序的表达式；不支持的数据库返回 None"""
+    if dialect == "postgresql":
+        sql = (
+            "COALESCE((SELECT jsonb_agg(e ORDER BY ord) FROM jsonb_array_elements("
+            f"{_IMAGES_ARRAY[dialect]}) WITH ORDINALITY AS t(e, ord) "
+            "WHERE e->>'public_id' IS DISTINCT FROM :public_id), '[]'::jsonb)::json"
+        )
+    elif dialect == "sqlite":
+        sql = (
+            "(SELECT json_group_array(json(value)) FROM (SELECT value FROM json_each("
+            f"{_IMAGES_ARRAY[dialect]}) WHERE json_extract(value, '$.public_id') IS NOT :public_id ORDER BY key))"
+        )
+    else:
+        return None
+    return text(sql).bindparams(public_id=public_id)
+
+
+async def append_fruit_images(db: AsyncSession, fruit_id: str, images: List[dict]) -> bool:
+    """
+    原子地把图片追加到 images 末尾（PG: jsonb ||，SQLite: json_insert），并发追加不会互相覆盖。
+    不提交；水果不存在时返回 False。
+    """
+    dialect = db.get_bind().dialect.name
+    expr = _images_appended(dialect, images)
+    if expr is None:
+        # 其他数据库：锁行后在 Python 里合并
+        current = (await db.execute(
+            select(FruitModel.images).where(FruitModel.id == fruit_id).with_for_update()
+        )).first()
+        if current is None:
+            return False
+        expr = list(current.images or []) + images
+    res = await db.execute(
+        update(FruitModel).where(FruitModel.id == fruit_id)
+        .values(images=expr, version=FruitModel.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return res.rowcount > 0
+
+
+async def remove_fruit_image(db: AsyncSession, fruit_id: str, public_id: str) -> Optional[int]:
+    """
+    从 images 中删掉 public_id 匹配的所有图片，返回删掉的张数；水果不存在返回 None。
+    先锁行读出数量（供释放资源引用），再在库内过滤，不整体改写列表。不提交。
+    """
+    current = (await db.execute(
+        select(FruitModel.images).where(FruitModel.id == fruit_id).with_for_update()
+    )).first()
+    if current is None:
+        return None
+    images = current.images if isinstance(current.images, list) else []
+    removed = sum(1 for img in images if isinstance(img, dict) and img.get("public_id") == public_id)
+    if removed:
+        expr = _images_without(db.get_bind().dialect.name, public_id)
+        if expr is None:
+            expr = [img for img in images if not (isinstance(img, dict) and img.get("public_id") == public_id)]
+        await db.execute(
+            update(FruitModel).where(FruitModel.id == fruit_id)
+            .values(images=expr, version=FruitModel.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+    return removed
+
+
+async def bulk_delete(db: AsyncSession, ids: List[str]) -> Tuple[int, List[str]]:
+    """返回 (删除的行数, 提交后需要删除的远端 public_id)：被删水果的图片在同一事务里释放引用"""
+    images = await db.execute(select(FruitModel.images).where(FruitModel.id.in_(ids)).with_for_update())
+    to_destroy = await release_image_refs(db, image_ref_counts(row.images for row in images))
+    # SQLite 默认不开外键约束，标签行显式删除
+    await db.execute(delete(FruitTag).where(FruitTag.fruit_id.in_(ids)))
     res = await db.execute(delete(FruitModel).where(FruitModel.id.in_(ids)))
     await db.commit()
-    return res.rowcount if hasattr(res, 'rowcount') else 0
+    await invalidate_fruit_caches(ids)
+    ngram_index.discard(ids)
+    return (res.rowcount if hasattr(res, 'rowcount') else 0), to_destroy
 
 
 async def bulk_update(db: AsyncSession, items: List[dict]):
+    """
+    一次 IN 查询（FOR UPDATE）取出全部目标行，在内存中按字段合并后一次 flush。
+    item 带 version 时做乐观锁校验，不一致的条目返回冲突并跳过。
+    返回 (逐条结果, 提交后需要删除的远端 public_id)：替换 images 时按前后差异增减资源引用。
+    """
+    ids = list(dict.fromkeys(it["id"] for it in items if it.get("id")))
+    existing = {}
+    if ids:
+        rows = await db.execute(select(FruitModel).where(FruitModel.id.in_(ids)).with_for_update())
+        existing = {o.id: o for o in rows.scalars()}
+
     results = []
+    updated = {}
+    images_before, images_after = [], []
+    now = datetime.utcnow().isoformat()
     for it in items:
         fid = it.get("id")
         if not fid:
             results.append({"id": None, "ok": False, "msg": "missing id"})
             continue
-        obj = await get_fruit(db, fid)
+        obj = existing.get(fid)
         if not obj:
             results.append({"id": fid, "ok": False, "msg": "not found"})
             continue
+        expected = it.get("version")
+        if expected is not None and expected != obj.version:
+            results.append({"id": fid, "ok": False, "msg": "version conflict", "version": obj.version})
+            continue
         for k, v in it.items():
-            if k == "id":
+            if k in ("id", "version"):
                 continue
-            if k == "images" and v is None:
-                # 不覆盖原有图片
+            if k in ("images", "name_cn") and v is None:
+                # 不覆盖原有图片；name_cn 不允许为空
                 continue
             if k == "images" and isinstance(v, list):
                 # 自动生成 uploaded_at 时间
                 for img in v:
                     if img.get("uploaded_at") is None:
-                        from datetime import datetime
-                        img["uploaded_at"] = datetime.utcnow().isoformat()
+                        img["uploaded_at"] = now
+                images_before.append(obj.images)
+                images_after.append(v)
             if hasattr(obj, k):
                 setattr(obj, k, v)
-        db.add(obj)
-        results.append({"id": fid, "ok": True, "msg": "updated"})
+        obj.version = (obj.version or 1) + 1
+        updated[fid] = obj
+        results.append({"id": fid, "ok": True, "msg": "updated", "version": obj.version})
+    await _replace_tags(db, list(updated.values()))
+    before, after = image_ref_counts(images_before), image_ref_counts(images_after)
+    await add_image_refs(db, after - before)
+    to_destroy = await release_image_refs(db, before - after)
     await db.commit()
-    return results
+    await invalidate_fruit_caches(updated.keys())
+    ngram_index.sync(updated.values())
+    return results, to_destroy
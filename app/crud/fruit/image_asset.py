@@ -0,0 +1,183 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+from datetime import datetime
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.fruit import Fruit, ImageAsset
+
+
+async def get_assets_by_hash(db: AsyncSession, hashes: List[str]) -> Dict[str, ImageAsset]:
+    if not hashes:
+        return {}
+    q = await db.execute(select(ImageAsset).where(ImageAsset.content_hash.in_(list(dict.fromkeys(hashes)))))
+    return {a.content_hash: a for a in q.scalars()}
+
+
+async def register_asset(db: AsyncSession, data: dict) -> Tuple[ImageAsset, bool]:
+    """
+    新增资源记录，返回 (asset, 是否由本次创建)。
+    并发上传了同一内容时主键冲突，返回已存在的那条，调用方应删除自己多传的远端资源。
+    """
+    asset = ImageAsset(**data, ref_count=0)
+    try:
+        async with db.begin_nested():
+            db.add(asset)
+        return asset, True
+    except IntegrityError:
+        db.expunge(asset)
+        existing = (await get_assets_by_hash(db, [data["content_hash"]]))[data["content_hash"]]
+        return existing, False
+
+
+async def acquire_asset(db: AsyncSession, content_hash: str, n: int = 1) -> Optional[ImageAsset]:
+    """
+    引用数加 n 并返回库里当前的记录（UPDATE 持有行锁直到提交，之后的读取不会再变）。
+    调用方手里的记录可能是上传前查到的旧快照：期间最后一个引用被释放、远端已在删除时返回 None，
+    需要重新上传登记；同一内容被别处重新登记过时返回的是新的 public_id。
+    """
+    res = await db.execute(
+        update(ImageAsset)
+        .where(ImageAsset.content_hash == content_hash)
+        .values(ref_count=ImageAsset.ref_count + n)
+        .execution_options(synchronize_session=False)
+    )
+    if res.rowcount == 0:
+        return None
+    return (await db.execute(
+        select(ImageAsset).where(ImageAsset.content_hash == content_hash)
+        .execution_options(populate_existing=True)
+    )).scalars().one()
+
+
+async def release_asset(db: AsyncSession, public_id: str, n: int = 1) -> Tuple[bool, Optional[ImageAsset]]:
+    """
+    引用数减 n，返回 (是否有资源记录, 需要删除远端的 asset 或 None)。
+    引用归零时同时删除记录；没有记录的旧图片由调用方直接删除远端。
+    """
+    asset = (await db.execute(
+        select(ImageAsset).where(ImageAsset.public_id == public_id).with_for_update()
+    )).scalars().first()
+    if asset is None:
+        return False, None
+    if asset.ref_count - n > 0:
+        asset.ref_count = asset.ref_count - n
+        return True, None
+    await db.execute(delete(ImageAsset).where(ImageAsset.content_hash == asset.content_hash))
+    return True, asset
+
+
+def image_ref_counts(image_lists: Iterable) -> Counter:
+    """若干 images 列表中各 public_id 出现的次数"""
+    counts = Counter()
+    for images in image_lists:
+        for img in images if isinstance(images, list) else []:
+            if isinstance(img, dict) and img.get("public_id"):
+                counts[img["public_id"]] += 1
+    return counts
+
+
+async def add_image_refs(db: AsyncSession, counts: Mapping[str, int]) -> None:
+    """按 public_id 给已登记的资源加引用（写入的 images 里带了已有图片时）；没有记录的旧图片忽略"""
+    by_n: Dict[int, List[str]] = {}
+    for public_id, n in counts.items():
+        if n > 0:
+            by_n.setdefault(n, []).append(public_id)
+    for n, public_ids in by_n.items():
+        await db.execute(
+            update(ImageAsset)
+            .where(ImageAsset.public_id.in_(public_ids))
+            .values(ref_count=ImageAsset.ref_count + n)
+        )
+
+
+async def release_image_refs(db: AsyncSession, counts: Mapping[str, int]) -> List[str]:
+    """
+    按 public_id 批量减引用，引用归零的记录一并删除；返回提交后需要删除的远端 public_id（含衍生图）。
+    没有资源记录的旧图片不在这里删除——批量写入可能复制过同一个 public_id，交给孤儿清理判断。
+    """
+    counts = {public_id: n for public_id, n in counts.items() if n > 0}
+    if not counts:
+        return []
+    assets = (await db.execute(
+        select(ImageAsset).where(ImageAsset.public_id.in_(list(counts))).with_for_update()
+    )).scalars().all()
+    released, to_destroy = [], []
+    for asset in assets:
+        if asset.ref_count - counts[asset.public_id] > 0:
+            asset.ref_count = asset.ref_count - counts[asset.public_id]
+        else:
+            released.append(asset.content_hash)
+            to_destroy.extend(asset_public_ids(asset))
+    if released:
+        await db.execute(delete(ImageAsset).where(ImageAsset.content_hash.in_(released)))
+    return to_destroy
+
+
+def asset_public_ids(asset: ImageAsset) -> List[str]:
+    ids = [asset.public_id]
+    ids.extend(d["public_id"] for d in (asset.derivatives or []) if d.get("public_id"))
+    return ids
+
+
+def asset_image_meta(asset: ImageAsset, filename: Optional[str]) -> dict:
+    return {
+        "url": asset.url,
+        "secure_url": asset.secure_url,
+        "public_id": asset.public_id,
+        "alt": filename,
+        "source": "cloudinary",
+        "uploaded_at": datetime.utcnow().isoformat(),
+        "width": asset.width,
+        "height": asset.height,
+        "bytes": asset.bytes,
+        "format": asset.format,
+        "content_hash": asset.content_hash,
+        "derivatives": asset.derivatives,
+    }
+
+
+async def asset_ref_snapshot(db: AsyncSession, batch_size: int = 1000) -> Dict[str, Tuple[str, int]]:
+    """全部资源记录的 public_id（含衍生图）→ (content_hash, ref_count)，分批流式读取"""
+    snapshot: Dict[str, Tuple[str, int]] = {}
+    assets = await db.stream(
+        select(ImageAsset.content_hash, ImageAsset.ref_count, ImageAsset.public_id, ImageAsset.derivatives)
+        .execution_options(yield_per=batch_size)
+    )
+    async for content_hash, ref_count, public_id, derivatives in assets:
+        for pid in [public_id, *(d["public_id"] for d in derivatives or [] if d.get("public_id"))]:
+            snapshot[pid] = (content_hash, ref_count)
+    return snapshot
+
+
+async def referenced_public_ids(db: AsyncSession, batch_size: int = 1000) -> Set[str]:
+    """
+    fruits.images 中实际引用的全部 Cloudinary public_id（含衍生图），分批流式读取。
+    不以资源记录为准：引用数可能因旧版本的批量删除而偏高，记录在但已无水果使用。
+    """
+    ids: Set[str] = set()
+    fruits = await db.stream(
+        select(Fruit.images).where(Fruit.images.isnot(None)).execution_options(yield_per=batch_size)
+    )
+    async for (images,) in fruits:
+        for img in images if isinstance(images, list) else []:
+            if isinstance(img, dict):
+                if img.get("public_id"):
+                    ids.add(img["public_id"])
+                ids.update(d["public_id"] for d in img.get("derivatives") or [] if d.get("public_id"))
+    return ids
+
+
+async def drop_unreferenced_assets(db: AsyncSession, ref_counts: Mapping[str, int]) -> Set[str]:
+    """
+    删除孤儿清理判定为无人使用的资源记录（content_hash → 快照时的 ref_count），返回实际删除的 content_hash。
+    ref_count 与快照不一致说明之后被复用过，保留该记录、不删远端。不提交。
+    """
+    dropped = set()
+    for content_hash, ref_count in ref_counts.items():
+        res = await db.execute(
+            delete(ImageAsset).where(ImageAsset.content_hash == content_hash, ImageAsset.ref_count == ref_count)
+        )
+        if res.rowcount:
+            dropped.add(content_hash)
+    return dropped
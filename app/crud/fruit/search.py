@@ -0,0 +1,156 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import select, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.fruit import Fruit as FruitModel
+
+# auto: Postgres 用 pg_trgm，其他数据库（如 SQLite 测试）用进程内 n-gram 索引
+SEARCH_MODES = ("auto", "substring", "trigram", "ngram")
+
+
+def resolve_search_mode(db: AsyncSession, mode: str) -> str:
+    """
+    trigram 依赖 pg_trgm，只能用于 Postgres；ngram 是进程内索引，多 worker 写入时各自陈旧，
+    只用于 SQLite 等单进程环境。与当前数据库不匹配时抛 ValueError（接口返回 400）。
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"search_mode must be one of {', '.join(SEARCH_MODES)}")
+    postgres = db.get_bind().dialect.name == "postgresql"
+    if mode == "auto":
+        return "trigram" if postgres else "ngram"
+    if mode == "trigram" and not postgres:
+        raise ValueError("search_mode=trigram requires PostgreSQL")
+    if mode == "ngram" and postgres:
+        raise ValueError("search_mode=ngram is not available on PostgreSQL; use auto or trigram")
+    return mode
+
+
+def like_pattern(q: str) -> str:
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def substring_clause(q: str):
+    like = like_pattern(q)
+    return or_(FruitModel.name_cn.ilike(like, escape="\\"), FruitModel.description.ilike(like, escape="\\"))
+
+
+def trigram_rank(q: str):
+    """pg_trgm 相关度：名称相似度优先，描述按词相似度折半计分"""
+    return func.greatest(
+        func.similarity(FruitModel.name_cn, q),
+        func.coalesce(func.word_similarity(q, FruitModel.description), 0) * 0.5,
+    )
+
+
+class NgramIndex:
+    """
+    进程内 n-gram 倒排索引（中文没有分词边界，直接按字切 gram）。
+    同时索引 unigram 和 n-gram，单字查询也能走索引；候选集再做一次子串校验。
+    """
+
+    def __init__(self, n: int = 2):
+        self.n = n
+        self.loaded = False
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._docs: Dict[str, Tuple[str, str]] = {}
+        self._lock = asyncio.Lock()
+
+    def _grams(self, text: str) -> Set[str]:
+        grams = set(text)
+        grams.update(text[i:i + self.n] for i in range(len(text) - self.n + 1))
+        return grams
+
+    def _query_grams(self, text: str) -> Set[str]:
+        if len(text) < self.n:
+            return set(text)
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def add(self, doc_id: str, name: Optional[str], description: Optional[str]) -> None:
+        self.remove(doc_id)
+        doc = ((name or "").lower(), (description or "").lower())
+        self._docs[doc_id] = doc
+        for gram in self._grams(doc[0]) | self._grams(doc[1]):
+            self._postings[gram].add(doc_id)
+
+    def remove(self, doc_id: str) -> None:
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        for gram in self._grams(doc[0]) | self._grams(doc[1]):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def clear(self) -> None:
+        self._postings.clear()
+        self._docs.clear()
+        self.loaded = False
+
+    def search(self, q: str) -> List[Tuple[str, float]]:
+        """返回按相关度降序排列的 [(id, score)]"""
+        needle = q.lower()
+        grams = self._query_grams(needle)
+        if not grams:
+            return []
+        postings = sorted((self._postings.get(g, set()) for g in grams), key=len)
+        candidates = set(postings[0])
+        for ids in postings[1:]:
+            candidates &= ids
+            if not candidates:
+                return []
+        hits = []
+        for doc_id in candidates:
+            name, description = self._docs[doc_id]
+            if name == needle:
+                score = 4.0
+            elif name.startswith(needle):
+                score = 3.0
+            elif needle in name:
+                score = 2.0
+            elif needle in description:
+                score = 1.0
+            else:
+                continue
+            # 名称越短越接近查询词
+            if needle in name:
+                score += len(needle) / max(len(name), 1)
+            hits.append((doc_id, score))
+        hits.sort(key=lambda h: (-h[1], h[0]))
+        return hits
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        if self.loaded:
+            return
+        async with self._lock:
+            if self.loaded:
+                return
+            rows = await db.execute(select(FruitModel.id, FruitModel.name_cn, FruitModel.description))
+            for doc_id, name, description in rows:
+                self.add(doc_id, name, description)
+            self.loaded = True
+
+    def sync(self, objs: Iterable[FruitModel]) -> None:
+        """写路径调用：未加载时跳过，首次搜索会整体重建"""
+        if not self.loaded:
+            return
+        for obj in objs:
+            self.add(obj.id, obj.name_cn, obj.description)
+
+    def sync_rows(self, rows: Iterable[dict]) -> None:
+        if not self.loaded:
+            return
+        for row in rows:
+            self.add(row["id"], row.get("name_cn"), row.get("description"))
+
+    def discard(self, ids: Iterable[str]) -> None:
+        if not self.loaded:
+            return
+        for doc_id in ids:
+            self.remove(doc_id)
+
+
+ngram_index = NgramIndex()
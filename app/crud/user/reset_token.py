@@ -0,0 +1,78 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.security import hash_reset_token
+from app.db.models.user.reset_token import PasswordResetToken
+
+
+def add_reset_token(db: AsyncSession, token: str, user_id: str, expires_at: datetime) -> PasswordResetToken:
+    """只加入会话不提交，由调用方统一提交"""
+    record = PasswordResetToken(token_hash=hash_reset_token(token), user_id=user_id, expires_at=expires_at)
+    db.add(record)
+    return record
+
+
+def _usable(token_hash: str, max_failed: int):
+    return (
+        PasswordResetToken.token_hash == token_hash,
+        PasswordResetToken.expires_at > datetime.utcnow(),
+        PasswordResetToken.failed_attempts < max_failed,
+    )
+
+
+async def record_failed_attempt(db: AsyncSession, token: str, max_failed: int) -> Optional[int]:
+    """
+    一条条件 UPDATE ... RETURNING 累加尝试 / 失败次数，返回新的失败次数；
+    token 不存在、已过期或已达上限时返回 None。达到上限的行会被删除。不提交。
+    """
+    token_hash = hash_reset_token(token)
+    failed = (await db.execute(
+        update(PasswordResetToken)
+        .where(*_usable(token_hash, max_failed))
+        .values(
+            attempt_count=PasswordResetToken.attempt_count + 1,
+            failed_attempts=PasswordResetToken.failed_attempts + 1,
+        )
+        .returning(PasswordResetToken.failed_attempts)
+    )).scalar()
+    if failed is not None and failed >= max_failed:
+        await db.execute(delete(PasswordResetToken).where(PasswordResetToken.token_hash == token_hash))
+    return failed
+
+
+async def peek_reset_token(db: AsyncSession, token: str, max_failed: int) -> Optional[str]:
+    """只读检查 token 是否可用，返回 user_id；不消费、不加锁，最终以 consume_reset_token 为准"""
+    return (await db.execute(
+        select(PasswordResetToken.user_id).where(*_usable(hash_reset_token(token), max_failed))
+    )).scalar()
+
+
+async def consume_reset_token(db: AsyncSession, token: str, max_failed: int) -> Optional[str]:
+    """
+    条件 DELETE ... RETURNING 原子地消费 token，返回 user_id；
+    不可用时返回 None。并发提交同一 token 只有一个能成功。不提交。
+    """
+    return (await db.execute(
+        delete(PasswordResetToken)
+        .where(*_usable(hash_reset_token(token), max_failed))
+        .returning(PasswordResetToken.user_id)
+    )).scalar()
+
+
+async def purge_expired_reset_tokens(db: AsyncSession, batch_size: int = 1000) -> int:
+    """按批删除过期 token，每批单独提交，避免长事务和大范围锁"""
+    total = 0
+    while True:
+        expired = (
+            select(PasswordResetToken.token_hash)
+            .where(PasswordResetToken.expires_at <= datetime.utcnow())
+            .limit(batch_size)
+        )
+        result = await db.execute(
+            delete(PasswordResetToken).where(PasswordResetToken.token_hash.in_(expired.scalar_subquery()))
+        )
+        await db.commit()
+        total += result.rowcount or 0
+        if (result.rowcount or 0) < batch_size:
+            return total
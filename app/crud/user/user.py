@@ -1,10 +1,14 @@
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timezone
 from app.db.models.user.user import User
-from app.core.security import hash_password, verify_password
+from app.schemas.user.user import CurrentUser
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.security import hash_password_async, verify_password_async, verify_and_update_password_async
 
 async def create_user(db: AsyncSession, email: str, password: str) -> User:
-    user = User(email=email, hashed_password=hash_password(password))
+    user = User(email=email, hashed_password=await hash_password_async(password))
     db.add(user)
     await db.commit()
     await db.refresh(user)
@@ -14,18 +18,50 @@ async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
     result = await db.execute(select(User).where(User.email == email))
     return result.scalars().first()
 
+# 鉴权用的用户身份缓存（进程内）；凭据变更时写穿失效，其他 worker 最多滞后一个 TTL
+_identity_cache = TTLCache(maxsize=settings.AUTH_USER_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL)
+
+async def get_user_identity(db: AsyncSession, email: str) -> CurrentUser | None:
+    identity = _identity_cache.get(email)
+    if identity is None:
+        user = await get_user_by_email(db, email)
+        if not user:
+            return None
+        identity = CurrentUser.model_validate(user)
+        _identity_cache.set(email, identity)
+    return identity
+
+def invalidate_user_identity(email: str) -> None:
+    _identity_cache.pop(email)
+
+def mark_password_changed(user: User) -> None:
+    """改密时调用：记录时间，提交后再 invalidate_user_identity"""
+    user.password_changed_at = datetime.now(timezone.utc)
+
 async def authenticate_user(db: AsyncSession, email: str, password: str) -> User | None:
     user = await get_user_by_email(db, email)
-    if user and verify_password(password, user.hashed_password):
-        return user
-    return None
+    if not user:
+        return None
+    if not settings.PASSWORD_REHASH_ON_LOGIN:
+        return user if await verify_password_async(password, user.hashed_password) else None
+    ok, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+    if not ok:
+        return None
+    if new_hash:
+        # 哈希参数已升级：顺带写回新哈希，不需要用户额外操作
+        user.hashed_password = new_hash
+        db.add(user)
+        await db.commit()
+    return user
 
 async def update_user_password(db: AsyncSession, user_id: str, new_password: str):
     user = await db.get(User, user_id)
     if not user:
         return None
-    user.hashed_password = hash_password(new_password)
+    user.hashed_password = await hash_password_async(new_password)
+    mark_password_changed(user)
     db.add(user)
     await db.commit()
+    invalidate_user_identity(user.email)
     await db.refresh(user)
     return user
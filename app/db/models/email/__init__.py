@@ -0,0 +1,3 @@
+from .outbox import EmailOutbox, OUTBOX_PENDING, OUTBOX_SENT, OUTBOX_FAILED
+
+__all__ = ["EmailOutbox", "OUTBOX_PENDING", "OUTBOX_SENT", "OUTBOX_FAILED"]
@@ -0,0 +1,31 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Integer, Text, Index
+from app.db.base import Base
+
+OUTBOX_PENDING = "pending"
+OUTBOX_SENT = "sent"
+OUTBOX_FAILED = "failed"
+
+
+class EmailOutbox(Base):
+    """
+    待发送邮件。与业务数据同一事务写入，由后台发送器异步投递：
+    提交成功就一定会发（至少一次），请求本身不等 SMTP。
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # 发送器按 status + next_attempt_at 领取任务
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    to_email = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String(16), nullable=False, default=OUTBOX_PENDING, server_default=OUTBOX_PENDING)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    # 下次可领取时间；领取时顺延一个租约，进程崩溃后租约到期会被重新领取
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
@@ -1,3 +1,5 @@
-from .fruit import Fruit
+from .fruit import Fruit, NUTRITION_COLUMNS, nutrition_values
+from .tag import FruitTag, TAG_KINDS, TAG_VALUE_MAX_LENGTH
+from .image_asset import ImageAsset
 
-__all__ = ["Fruit"]
+__all__ = ["Fruit", "NUTRITION_COLUMNS", "nutrition_values", "FruitTag", "TAG_KINDS", "TAG_VALUE_MAX_LENGTH", "ImageAsset"]
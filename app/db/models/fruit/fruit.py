@@ -1,9 +1,30 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Text
+from typing import Optional
+from sqlalchemy import Column, String, DateTime, Text, Integer, Float, Index, DDL, event
+from sqlalchemy.orm import validates
 from sqlalchemy.types import JSON
 from app.db.base import Base
 
+# nutritional_value 中可筛选 / 排序的字段，各自冗余存成一列（列名与 JSON 键相同）
+NUTRITION_COLUMNS = (
+    "calories_kcal", "protein_g", "fat_g", "carbs_g",
+    "sugar_g", "fiber_g", "vitamin_c_mg", "potassium_mg",
+)
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return None if value is None else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def nutrition_values(nutritional_value) -> dict:
+    """nutritional_value JSON → 各营养列的值；不走 ORM 属性赋值的批量写入路径需手动合并"""
+    data = nutritional_value if isinstance(nutritional_value, dict) else {}
+    return {name: _to_float(data.get(name)) for name in NUTRITION_COLUMNS}
+
 
 # # 若使用 Postgres，可用 PG_UUID，否则 String(36)
 # try:
@@ -13,6 +34,19 @@ from app.db.base import Base
 
 class Fruit(Base):
     __tablename__ = "fruits"
+    __table_args__ = (
+        # keyset 分页：(排序列, id) 复合索引
+        Index("ix_fruits_name_cn_id", "name_cn", "id"),
+        Index("ix_fruits_created_at_id", "created_at", "id"),
+        Index("ix_fruits_updated_at_id", "updated_at", "id"),
+        # q 子串搜索：pg_trgm GIN 索引，可服务 ILIKE '%q%' 和 similarity()
+        Index("ix_fruits_name_cn_trgm", "name_cn",
+              postgresql_using="gin", postgresql_ops={"name_cn": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_fruits_description_trgm", "description",
+              postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        # 营养字段范围筛选 + keyset 排序
+        *(Index(f"ix_fruits_{name}_id", name, "id") for name in NUTRITION_COLUMNS),
+    )
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name_cn = Column(String(128), nullable=False, index=True)
     images = Column(JSON, nullable=True)
@@ -23,3 +57,29 @@ class Fruit(Base):
     description = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 乐观锁版本号，bulk_update 每次成功更新 +1
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # 由 nutritional_value 派生，写入时同步（见 sync_nutrition / nutrition_values）
+    calories_kcal = Column(Float, nullable=True)
+    protein_g = Column(Float, nullable=True)
+    fat_g = Column(Float, nullable=True)
+    carbs_g = Column(Float, nullable=True)
+    sugar_g = Column(Float, nullable=True)
+    fiber_g = Column(Float, nullable=True)
+    vitamin_c_mg = Column(Float, nullable=True)
+    potassium_mg = Column(Float, nullable=True)
+
+    @validates("nutritional_value")
+    def sync_nutrition(self, key, value):
+        for name, number in nutrition_values(value).items():
+            setattr(self, name, number)
+        return value
+
+
+# trigram 索引依赖 pg_trgm 扩展，建表前确保已启用（仅 Postgres）
+event.listen(
+    Fruit.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
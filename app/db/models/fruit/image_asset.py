@@ -0,0 +1,23 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Integer
+from sqlalchemy.types import JSON
+from app.db.base import Base
+
+
+class ImageAsset(Base):
+    """按内容哈希去重的 Cloudinary 资源；多个水果可以引用同一张图"""
+    __tablename__ = "image_assets"
+
+    content_hash = Column(String(64), primary_key=True)  # sha256 hex
+    public_id = Column(String(255), nullable=False, unique=True, index=True)
+    url = Column(String(1024), nullable=False)
+    secure_url = Column(String(1024), nullable=True)
+    format = Column(String(16), nullable=True)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    bytes = Column(Integer, nullable=True)
+    # 本地生成并上传的缩略图 / WebP 衍生图
+    derivatives = Column(JSON, nullable=True)
+    # 引用次数（fruits.images 中出现的次数），归零时才真正删除远端资源
+    ref_count = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, ForeignKey, Index
+from app.db.base import Base
+
+# 从 Fruit 的 JSON 列拆出来做筛选 / 分面统计的标签种类
+TAG_KINDS = ("origin", "season")
+# 标签值最大长度，写入接口的 origin / season 按此校验
+TAG_VALUE_MAX_LENGTH = 128
+
+
+class FruitTag(Base):
+    """origin / season 的规范化标签表；Fruit 上的 JSON 列仍是返回数据的来源"""
+    __tablename__ = "fruit_tags"
+    __table_args__ = (
+        # 按 (kind, value) 查 fruit_id，以及分面 GROUP BY 都走这个索引
+        Index("ix_fruit_tags_kind_value", "kind", "value", "fruit_id"),
+    )
+
+    fruit_id = Column(String(36), ForeignKey("fruits.id", ondelete="CASCADE"), primary_key=True)
+    kind = Column(String(16), primary_key=True)
+    value = Column(String(TAG_VALUE_MAX_LENGTH), primary_key=True)
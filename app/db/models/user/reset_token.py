@@ -5,10 +5,12 @@ from app.db.base import Base
 class PasswordResetToken(Base):
     __tablename__ = "password_reset_tokens"
 
-    token = Column(String, primary_key=True, index=True)
+    # 只存 token 的 sha256（hex 定长 64），不存完整 JWT；列名沿用 token
+    token_hash = Column("token", String(64), primary_key=True)
     user_id = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    expires_at = Column(DateTime, nullable=False)
+    # 后台清理按过期时间批量删除
+    expires_at = Column(DateTime, nullable=False, index=True)
     used = Column(Boolean, default=False)
     attempt_count = Column(Integer, default=0)
     failed_attempts = Column(Integer, default=0)
@@ -11,3 +11,5 @@ class User(Base):
     email = Column(String(255), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # 改密 / 重置密码时间；早于此时间签发的 token 视为失效
+    password_changed_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,14 +1,82 @@
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from fastapi import Request, Response
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.base import Base
+from app.db.upgrade import upgrade_schema
+
+logger = logging.getLogger(__name__)
+
+# 启动期建表 / 数据补齐用的 PG advisory lock 键，多 worker 时只有一个在执行
+STARTUP_LOCK_KEY = 7_310_245_001
+# 写入后下发的 cookie：值为截止时间戳，之前该客户端的读请求走主库
+PRIMARY_STICKY_COOKIE = "db_primary_until"
+
+
+# 启动时 advisory lock 占住一条连接，建表 / 补数据还要再借一条，少于 2 条会卡到 pool_timeout
+MIN_POOL_CONNECTIONS = 2
+
+
+def pool_sizes(pool_size, max_overflow: int, budget, workers: int):
+    """
+    返回 (pool_size, max_overflow)。设置了总连接预算时，每个 worker 的
+    pool_size + max_overflow 不超过 budget // workers；显式的 DB_POOL_SIZE 优先。
+    每个 worker 可用连接少于 MIN_POOL_CONNECTIONS 时抛 ValueError。
+    """
+    if pool_size is not None or not budget:
+        pool_size = pool_size or 5
+        if pool_size + max_overflow < MIN_POOL_CONNECTIONS:
+            raise ValueError(
+                f"DB_POOL_SIZE + DB_MAX_OVERFLOW must be at least {MIN_POOL_CONNECTIONS}, "
+                f"got {pool_size} + {max_overflow}"
+            )
+        return pool_size, max_overflow
+    workers = max(1, workers)
+    per_worker = budget // workers
+    if per_worker < MIN_POOL_CONNECTIONS:
+        raise ValueError(
+            f"DB_TOTAL_CONNECTION_BUDGET={budget} leaves {per_worker} connection(s) per worker "
+            f"for WEB_CONCURRENCY={workers}; need at least {MIN_POOL_CONNECTIONS} per worker"
+        )
+    overflow = min(max_overflow, per_worker // 2)
+    return per_worker - overflow, overflow
+
+
+def engine_options(url: str) -> dict:
+    options = {"echo": False, "future": True}  # echo 调试时可设 True
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        return options
+    pool_size, max_overflow = pool_sizes(
+        settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW,
+        settings.DB_TOTAL_CONNECTION_BUDGET, settings.WEB_CONCURRENCY,
+    )
+    options.update(
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        # 关闭时每次 checkout 少一次往返，靠 pool_recycle 规避服务端空闲断开
+        pool_pre_ping=settings.DB_PRE_PING,
+    )
+    if make_url(url).get_driver_name() == "asyncpg":
+        # PgBouncer transaction 模式下需设为 0
+        options["connect_args"] = {
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        }
+    return options
+
 
 # ✅ 使用 asyncpg 驱动创建异步引擎
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=False,          # 调试时可设 True
-    pool_pre_ping=True,  # 检查连接是否可用
-    future=True          # 启用 SQLAlchemy 2.0 行为
-)
+engine = create_async_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
 
 # ✅ 创建异步 SessionLocal
 AsyncSessionLocal = sessionmaker(
@@ -17,7 +85,166 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
+# 可选的只读副本
+replica_engine = (
+    create_async_engine(settings.DATABASE_REPLICA_URL, **engine_options(settings.DATABASE_REPLICA_URL))
+    if settings.DATABASE_REPLICA_URL else None
+)
+ReplicaSessionLocal = sessionmaker(
+    bind=replica_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+) if replica_engine is not None else None
+
+
+class DatabaseManager:
+    """
+    引擎生命周期：启动时检查连通性、串行化建表，关闭时释放连接池。
+    配置了副本时负责读写路由：副本健康、且近期没有写入时读请求走副本。
+    """
+
+    def __init__(self, engine, session_factory, replica_engine=None, replica_session_factory=None):
+        self.engine = engine
+        self.session_factory = session_factory
+        self.replica_engine = replica_engine
+        self.replica_session_factory = replica_session_factory
+        self.replica_healthy = replica_engine is not None
+        self.last_write_at = float("-inf")
+
+    @property
+    def engines(self) -> list:
+        return [e for e in (self.engine, self.replica_engine) if e is not None]
+
+    async def init(self) -> None:
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        if self.replica_engine is not None:
+            # 副本不可用不阻止启动，读请求先回退主库，由健康检查恢复
+            await self.check_replica()
+        pool = self.engine.pool
+        logger.info(
+            "database pool ready: %s size=%s overflow=%s workers=%s",
+            type(pool).__name__, getattr(pool, "size", lambda: None)(),
+            getattr(pool, "_max_overflow", None), settings.WEB_CONCURRENCY,
+        )
+
+    @asynccontextmanager
+    async def startup_lock(self):
+        """PG 上用 advisory lock 保证多 worker 同时启动时建表 / 补数据只串行执行"""
+        if self.engine.dialect.name != "postgresql":
+            yield
+            return
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": STARTUP_LOCK_KEY})
+            try:
+                yield
+            finally:
+                await conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": STARTUP_LOCK_KEY})
+
+    async def create_all(self) -> None:
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def upgrade_schema(self) -> list:
+        """给已存在的表补齐后来新增的列 / 索引（见 app/db/upgrade.py），须在 create_all 之后"""
+        async with self.engine.begin() as conn:
+            return await conn.run_sync(upgrade_schema)
+
+    async def check_replica(self) -> bool:
+        """SELECT 1 探测副本，状态变化时记日志；返回当前是否健康"""
+        if self.replica_engine is None:
+            return False
+        try:
+            async with self.replica_engine.connect() as conn:
+                await asyncio.wait_for(conn.execute(text("SELECT 1")), settings.DB_REPLICA_HEALTH_TIMEOUT)
+            healthy = True
+        except Exception as exc:
+            healthy = False
+            if self.replica_healthy:
+                logger.warning("read replica unhealthy, reads fall back to primary: %s", exc)
+        if healthy and not self.replica_healthy:
+            logger.info("read replica healthy again")
+        self.replica_healthy = healthy
+        return healthy
+
+    def note_write(self) -> None:
+        self.last_write_at = time.monotonic()
+
+    def read_session_factory(self, prefer_primary: bool = False):
+        """
+        读请求用的 sessionmaker。以下情况走主库：未配置副本、副本不健康、调用方要求
+        （客户端刚写过），或本进程 DB_READ_YOUR_WRITES_SECONDS 内有过写入——
+        避免从滞后的副本读到旧数据后写进响应缓存。
+        """
+        if (
+            self.replica_session_factory is None
+            or not self.replica_healthy
+            or prefer_primary
+            or time.monotonic() - self.last_write_at < settings.DB_READ_YOUR_WRITES_SECONDS
+        ):
+            return self.session_factory
+        return self.replica_session_factory
+
+    @staticmethod
+    def _pool_status(engine) -> dict:
+        pool = engine.pool
+        status = {"class": type(pool).__name__}
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            fn = getattr(pool, name, None)
+            if callable(fn):
+                status[name] = fn()
+        return status
+
+    def pool_status(self) -> dict:
+        return self._pool_status(self.engine)
+
+    def replica_pool_status(self) -> dict:
+        """未配置副本时返回空 dict"""
+        if self.replica_engine is None:
+            return {}
+        return {**self._pool_status(self.replica_engine), "healthy": self.replica_healthy}
+
+    async def dispose(self) -> None:
+        for e in self.engines:
+            await e.dispose()
+
+
+db_manager = DatabaseManager(engine, AsyncSessionLocal, replica_engine, ReplicaSessionLocal)
+
 # ✅ FastAPI 依赖
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def _sticky_to_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _mark_written(response: Response) -> None:
+    window = settings.DB_READ_YOUR_WRITES_SECONDS
+    if window > 0:
+        response.set_cookie(
+            PRIMARY_STICKY_COOKIE, f"{time.time() + window:.3f}",
+            max_age=math.ceil(window), httponly=True, samesite="lax",
+        )
+
+
+def get_read_session_factory(request: Request):
+    """读接口按需开会话（缓存命中时不开）时使用"""
+    return db_manager.read_session_factory(prefer_primary=_sticky_to_primary(request))
+
+
+async def get_read_db(request: Request):
+    async with get_read_session_factory(request)() as session:
+        yield session
+
+
+async def get_write_db(response: Response):
+    """主库会话；提交后给客户端下发短期 cookie，让它接下来的读请求读到自己的写入"""
+    async with AsyncSessionLocal() as session:
+        event.listen(session.sync_session, "after_commit", lambda _: _mark_written(response))
+        yield session
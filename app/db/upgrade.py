@@ -0,0 +1,74 @@
+import logging
+from typing import List, Optional, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+from app.db.base import Base
+from app.db.models.fruit import NUTRITION_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# create_all 只建缺失的表，不会给已存在的表补列 / 索引。已部署的库在启动时
+# （startup_lock 内、create_all 之后）按下面的清单补齐，幂等、可重复执行。
+# 给已有表新增列 / 索引时在这里登记；定义取自模型，不重复写 DDL。
+# 大表上 Postgres 的 CREATE INDEX 会阻塞写入，可提前手工 CREATE INDEX CONCURRENTLY 同名索引，这里会跳过。
+
+# (方言或 None, SQL)：建索引前执行
+UPGRADE_STATEMENTS: List[Tuple[Optional[str], str]] = [
+    # trigram 索引依赖的扩展
+    ("postgresql", "CREATE EXTENSION IF NOT EXISTS pg_trgm"),
+]
+
+# (表, 列)
+UPGRADE_COLUMNS: List[Tuple[str, str]] = [
+    # 乐观锁版本号（NOT NULL，已有行取 server_default 1）
+    ("fruits", "version"),
+    # 改密时间，早于它签发的 token 失效
+    ("users", "password_changed_at"),
+    # 营养字段冗余列，值由启动时的 backfill_nutrition_columns 补齐
+    *(("fruits", name) for name in NUTRITION_COLUMNS),
+]
+
+# (表, 索引名, 方言或 None)
+UPGRADE_INDEXES: List[Tuple[str, str, Optional[str]]] = [
+    # keyset 分页：(排序列, id) 复合索引
+    ("fruits", "ix_fruits_name_cn_id", None),
+    ("fruits", "ix_fruits_created_at_id", None),
+    ("fruits", "ix_fruits_updated_at_id", None),
+    # q 子串搜索：pg_trgm GIN 索引
+    ("fruits", "ix_fruits_name_cn_trgm", "postgresql"),
+    ("fruits", "ix_fruits_description_trgm", "postgresql"),
+    # 过期 reset token 后台批量清理
+    ("password_reset_tokens", "ix_password_reset_tokens_expires_at", None),
+    # 营养字段范围筛选 + keyset 排序
+    *(("fruits", f"ix_fruits_{name}_id", None) for name in NUTRITION_COLUMNS),
+]
+
+
+def _index(table: str, name: str):
+    return next(ix for ix in Base.metadata.tables[table].indexes if ix.name == name)
+
+
+def upgrade_schema(conn) -> List[str]:
+    """在 conn.run_sync 中调用；返回本次实际执行的变更"""
+    dialect = conn.dialect.name
+    inspector = inspect(conn)
+    applied = []
+    for only, sql in UPGRADE_STATEMENTS:
+        if only in (None, dialect):
+            conn.execute(text(sql))
+    for table, name in UPGRADE_COLUMNS:
+        if name in {c["name"] for c in inspector.get_columns(table)}:
+            continue
+        column = CreateColumn(Base.metadata.tables[table].c[name]).compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column}"))
+        applied.append(f"column {table}.{name}")
+    for table, name, only in UPGRADE_INDEXES:
+        if only not in (None, dialect):
+            continue
+        if name in {ix["name"] for ix in inspector.get_indexes(table)}:
+            continue
+        _index(table, name).create(conn)
+        applied.append(f"index {name}")
+    if applied:
+        logger.info("schema upgraded: %s", ", ".join(applied))
+    return applied
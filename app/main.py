@@ -1,8 +1,21 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.db.session import Base, db_manager
+from fastapi.middleware.gzip import GZipMiddleware
+from app.core.config import settings
+from fastapi.responses import JSONResponse
+from app.core.executors import ExecutorOverloaded
+from app.core.security import hash_pool
+from app.core.metrics import MetricsMiddleware, instrument_engine
+from app.db.session import db_manager, AsyncSessionLocal
+from app.api.metrics import router as metrics_router
 from app.api.v1.user.user import router as user_router
 from app.api.v1.fruit import router as fruit_router
+from app.crud.fruit.fruit import backfill_fruit_tags, backfill_nutrition_columns
+from app.tasks.email import email_sender
+from app.tasks.cleanup import email_outbox_sweeper, reset_token_sweeper
+from app.tasks.health import replica_health_check
+from app.tasks.images import destroy_queue, orphan_sweeper
+from app.core.warmup import start_warm_up, stop_warm_up
 
 app = FastAPI()
 
@@ -14,19 +27,61 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if settings.GZIP_MINIMUM_SIZE > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE)
+# 最后添加即最外层：计时覆盖压缩，Server-Timing 头加在压缩后的响应上
+if settings.METRICS_ENABLED or settings.DEBUG or settings.QUERY_BUDGET_PER_REQUEST is not None:
+    app.add_middleware(MetricsMiddleware)
+    for db_engine in db_manager.engines:
+        instrument_engine(db_engine)
+
+@app.exception_handler(ExecutorOverloaded)
+async def executor_overloaded_handler(request: Request, exc: ExecutorOverloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, please retry later"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 app.include_router(user_router)
 app.include_router(fruit_router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router)
 
 @app.on_event("startup")
 async def startup():
     await db_manager.init()
-    async with db_manager.engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # 多 worker 同时启动时由 advisory lock 串行化，后来者建表 / 补齐都是空操作
+    async with db_manager.startup_lock():
+        await db_manager.create_all()
+        # 已有库补列 / 索引（create_all 不改已存在的表）
+        await db_manager.upgrade_schema()
+        # 旧数据补齐 origin / season 标签行和营养列
+        async with AsyncSessionLocal() as db:
+            await backfill_fruit_tags(db)
+            await backfill_nutrition_columns(db)
+    if settings.EMAIL_SENDER_ENABLED:
+        email_sender.start()
+    reset_token_sweeper.start()
+    email_outbox_sweeper.start()
+    if db_manager.replica_engine is not None:
+        replica_health_check.start()
+    # Cloudinary 删除在后台凑批执行；孤儿清理默认关闭（CLOUDINARY_ORPHAN_SWEEP_INTERVAL=0）
+    destroy_queue.start()
+    orphan_sweeper.start()
+    start_warm_up()
 
 @app.on_event("shutdown")
 async def shutdown():
+    await stop_warm_up()
+    await email_sender.stop()
+    await reset_token_sweeper.stop()
+    await email_outbox_sweeper.stop()
+    await replica_health_check.stop()
+    await orphan_sweeper.stop()
+    await destroy_queue.stop()
     await db_manager.dispose()
+    hash_pool.shutdown(wait=False)
 
 
 
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, HttpUrl
-from typing import List, Optional
+from typing import Annotated, Dict, List, Optional
 from datetime import datetime
 
 class Nutrition(BaseModel):
@@ -12,6 +12,15 @@ class Nutrition(BaseModel):
     vitamin_c_mg: Optional[float]
     potassium_mg: Optional[float]
 
+class ImageDerivative(BaseModel):
+    kind: str
+    url: HttpUrl
+    public_id: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    bytes: Optional[int] = None
+    format: Optional[str] = None
+
 class ImageMeta(BaseModel):
     url: HttpUrl
     secure_url: Optional[HttpUrl] = None
@@ -19,6 +28,15 @@ class ImageMeta(BaseModel):
     alt: Optional[str] = None
     source: Optional[str] = None
     uploaded_at: Optional[datetime] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    bytes: Optional[int] = None
+    format: Optional[str] = None
+    content_hash: Optional[str] = None
+    derivatives: Optional[List[ImageDerivative]] = None
+
+# origin / season 会拆进 fruit_tags.value 列（String(128)），写入时限制长度
+TagValue = Annotated[str, Field(max_length=128)]
 
 class FruitBase(BaseModel):
     name_cn: str
@@ -30,20 +48,80 @@ class FruitBase(BaseModel):
     description: Optional[str]
 
 class FruitCreate(FruitBase):
-    pass
+    origin: Optional[List[TagValue]] = []
+    season: Optional[List[TagValue]] = []
 
-class FruitUpdate(FruitBase):
+class FruitUpdate(BaseModel):
+    # 部分更新：只合并请求中出现的字段，未传的字段保持原值
     id: str
+    # 传入时与当前版本比对，不一致则该条返回冲突、不覆盖
+    version: Optional[int] = None
+    name_cn: Optional[str] = None
+    images: Optional[List[ImageMeta]] = None
+    origin: Optional[List[TagValue]] = None
+    season: Optional[List[TagValue]] = None
+    nutritional_value: Optional[Nutrition] = None
+    suitable_for: Optional[List[str]] = None
+    description: Optional[str] = None
 
 class Fruit(FruitBase):
     id: str
     created_at: Optional[datetime]
     updated_at: Optional[datetime]
+    version: Optional[int] = None
     class Config:
         orm_mode = True
 
 class PaginatedFruits(BaseModel):
     items: List[Fruit]
-    total: int
+    total: Optional[int] = None
     page: int
     per_page: int
+    next_cursor: Optional[str] = None
+
+class FruitBatchGetRequest(BaseModel):
+    ids: List[str]
+
+class FruitBatch(BaseModel):
+    # 与请求中 id 的顺序一致（去重后）；不存在的 id 列在 missing
+    items: List[Fruit]
+    missing: List[str]
+
+class FruitFacets(BaseModel):
+    origin: Dict[str, int]
+    season: Dict[str, int]
+
+class BulkCreateChunk(BaseModel):
+    index: int
+    offset: int
+    count: int
+    ok: bool
+    error: Optional[str] = None
+    ids: List[str] = []
+
+class BulkCreateReport(BaseModel):
+    mode: str
+    total: int
+    inserted: int
+    failed: int
+    chunks: List[BulkCreateChunk]
+
+class FruitImportError(BaseModel):
+    line: int
+    error: str
+
+class FruitImportChunk(BaseModel):
+    index: int
+    first_line: int
+    last_line: int
+    inserted: int
+    failed: int
+
+class FruitImportReport(BaseModel):
+    lines: int
+    inserted: int
+    failed: int
+    chunks: List[FruitImportChunk]
+    errors: List[FruitImportError]
+    # 错误行超过 FRUIT_IMPORT_MAX_ERRORS 时只计数不列出
+    errors_truncated: bool = False
@@ -0,0 +1,54 @@
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+from app.schemas.fruit.fruit import Fruit, ImageDerivative, ImageMeta, Nutrition
+
+# 字段顺序取自 schema，保证快速路径与 Pydantic 输出逐字节一致
+FRUIT_FIELDS = tuple(Fruit.model_fields)
+IMAGE_FIELDS = tuple(ImageMeta.model_fields)
+DERIVATIVE_FIELDS = tuple(ImageDerivative.model_fields)
+NUTRITION_FIELDS = tuple(Nutrition.model_fields)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """解析 fields=a,b,c；未知字段抛 ValueError。结果总包含 id，顺序按 schema"""
+    if not fields:
+        return None
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - set(FRUIT_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+    requested.add("id")
+    return tuple(f for f in FRUIT_FIELDS if f in requested)
+
+
+def _image(img: dict) -> dict:
+    out = {k: img.get(k) for k in IMAGE_FIELDS}
+    if out["derivatives"] is not None:
+        out["derivatives"] = [{k: d.get(k) for k in DERIVATIVE_FIELDS} for d in out["derivatives"]]
+    return out
+
+
+def _nutrition(value: dict) -> dict:
+    # 与 Optional[float] 校验后的输出一致：整数输出为 5.0
+    return {k: None if value.get(k) is None else float(value[k]) for k in NUTRITION_FIELDS}
+
+
+def fruit_to_dict(row: Any, fields: Sequence[str] = FRUIT_FIELDS, images_limit: Optional[int] = None) -> dict:
+    """
+    数据库行（Row 或 ORM 对象）转成与 Fruit schema 同序的 dict，不做校验。
+    前提是写入时已用 model_dump(mode="json") 规范化（URL、时间格式等）。
+    fields 限定输出字段；images_limit 只保留前 N 张图片。
+    """
+    out = {name: getattr(row, name) for name in fields}
+    images = out.get("images")
+    if images is not None:
+        if images_limit is not None:
+            images = images[:images_limit]
+        out["images"] = [_image(img) for img in images]
+    if out.get("nutritional_value") is not None:
+        out["nutritional_value"] = _nutrition(out["nutritional_value"])
+    return out
+
+
+def fruits_to_dicts(rows: Iterable[Any], fields: Sequence[str] = FRUIT_FIELDS,
+                    images_limit: Optional[int] = None) -> List[dict]:
+    return [fruit_to_dict(row, fields, images_limit) for row in rows]
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator
 from datetime import datetime
+from typing import Optional
 from uuid import UUID
 import re
 
@@ -31,6 +32,16 @@ class UserOut(BaseModel):
         from_attributes = True
 
 
+class CurrentUser(BaseModel):
+    id: UUID
+    email: EmailStr
+    created_at: datetime
+    password_changed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -53,3 +64,6 @@ class ResetPassword(BaseModel):
             raise ValueError("Password must contain at least one special character.")
         return v
 
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
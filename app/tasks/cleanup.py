@@ -0,0 +1,36 @@
+import logging
+from datetime import datetime, timedelta
+from app.core.config import settings
+from app.crud.email.outbox import purge_finished_emails
+from app.crud.user.reset_token import purge_expired_reset_tokens
+from app.db.session import AsyncSessionLocal
+from app.tasks.periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+
+async def purge_reset_tokens() -> int:
+    async with AsyncSessionLocal() as db:
+        deleted = await purge_expired_reset_tokens(db, batch_size=settings.RESET_TOKEN_PURGE_BATCH_SIZE)
+    if deleted:
+        logger.info("purged %d expired password reset tokens", deleted)
+    return deleted
+
+
+reset_token_sweeper = PeriodicTask(
+    "reset-token-sweeper", settings.RESET_TOKEN_PURGE_INTERVAL, purge_reset_tokens,
+)
+
+
+async def purge_email_outbox() -> int:
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.EMAIL_OUTBOX_RETENTION)
+    async with AsyncSessionLocal() as db:
+        deleted = await purge_finished_emails(db, cutoff, batch_size=settings.EMAIL_OUTBOX_PURGE_BATCH_SIZE)
+    if deleted:
+        logger.info("purged %d sent/failed outbox emails", deleted)
+    return deleted
+
+
+email_outbox_sweeper = PeriodicTask(
+    "email-outbox-sweeper", settings.EMAIL_OUTBOX_PURGE_INTERVAL, purge_email_outbox,
+)
@@ -1,20 +1,280 @@
+import asyncio
+import logging
+import random
+from contextlib import asynccontextmanager
 from email.message import EmailMessage
-import aiosmtplib
+from typing import TYPE_CHECKING, List, Optional
 from app.core.config import settings
+from app.crud.email.outbox import claim_batch, mark_retry, mark_sent, pending_count
+from app.db.models.email import EmailOutbox
+from app.db.session import AsyncSessionLocal
 
-async def send_email(to_email: str, subject: str, body: str):
+if TYPE_CHECKING:
+    import aiosmtplib
+
+logger = logging.getLogger(__name__)
+
+
+def build_message(to_email: str, subject: str, body: str) -> EmailMessage:
     message = EmailMessage()
     message["From"] = settings.EMAIL_USER
     message["To"] = to_email
     message["Subject"] = subject
     message.set_content(body)
+    return message
 
+
+def _tls_flags():
+    use_tls = settings.EMAIL_USE_TLS if settings.EMAIL_USE_TLS is not None else settings.EMAIL_PORT == 465
+    start_tls = settings.EMAIL_START_TLS if settings.EMAIL_START_TLS is not None else settings.EMAIL_PORT == 587
+    return use_tls, start_tls
+
+
+async def send_email(to_email: str, subject: str, body: str):
+    """直接发送单封邮件（每次新建连接）；业务代码应优先写发件箱"""
+    import aiosmtplib
+    use_tls, start_tls = _tls_flags()
     await aiosmtplib.send(
-        message,
+        build_message(to_email, subject, body),
         hostname=settings.EMAIL_HOST,
         port=settings.EMAIL_PORT,
-        username=settings.EMAIL_USER,
-        password=settings.EMAIL_PASSWORD,
-        use_tls=True if settings.EMAIL_PORT == 465 else False,
-        start_tls=True if settings.EMAIL_PORT == 587 else False
+        username=settings.EMAIL_USER if settings.EMAIL_AUTH else None,
+        password=settings.EMAIL_PASSWORD if settings.EMAIL_AUTH else None,
+        use_tls=use_tls,
+        start_tls=start_tls,
+        timeout=settings.EMAIL_TIMEOUT,
     )
+
+
+class SMTPConnectionPool:
+    """
+    已完成 TLS 握手和 AUTH 的 SMTP 连接池，连接按需创建、用完归还。
+    连接层出错的连接直接丢弃；服务器拒收（有响应码）时连接仍可复用。
+    """
+
+    def __init__(self, size: int, hostname: str, port: int, username: Optional[str] = None,
+                 password: Optional[str] = None, use_tls: bool = False, start_tls: bool = False,
+                 timeout: float = 30.0):
+        self.size = size
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.timeout = timeout
+        self._idle: List["aiosmtplib.SMTP"] = []
+        self._semaphore = asyncio.Semaphore(size)
+        self.connects = 0
+
+    @classmethod
+    def from_settings(cls) -> "SMTPConnectionPool":
+        use_tls, start_tls = _tls_flags()
+        return cls(
+            size=settings.EMAIL_POOL_SIZE,
+            hostname=settings.EMAIL_HOST,
+            port=settings.EMAIL_PORT,
+            username=settings.EMAIL_USER if settings.EMAIL_AUTH else None,
+            password=settings.EMAIL_PASSWORD if settings.EMAIL_AUTH else None,
+            use_tls=use_tls,
+            start_tls=start_tls,
+            timeout=settings.EMAIL_TIMEOUT,
+        )
+
+    async def _connect(self) -> "aiosmtplib.SMTP":
+        import aiosmtplib
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname, port=self.port, use_tls=self.use_tls,
+            start_tls=self.start_tls, timeout=self.timeout,
+        )
+        await client.connect()
+        if self.username:
+            await client.login(self.username, self.password)
+        self.connects += 1
+        return client
+
+    @staticmethod
+    def _discard(client: "aiosmtplib.SMTP") -> None:
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def connection(self):
+        import aiosmtplib
+        async with self._semaphore:
+            client = None
+            while self._idle:
+                candidate = self._idle.pop()
+                if candidate.is_connected:
+                    client = candidate
+                    break
+                self._discard(candidate)
+            if client is None:
+                client = await self._connect()
+            try:
+                yield client
+            except (aiosmtplib.SMTPResponseException, aiosmtplib.SMTPRecipientsRefused):
+                if client.is_connected:
+                    self._idle.append(client)
+                else:
+                    self._discard(client)
+                raise
+            except BaseException:
+                self._discard(client)
+                raise
+            self._idle.append(client)
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for client in idle:
+            try:
+                await client.quit()
+            except Exception:
+                self._discard(client)
+
+
+class EmailSender:
+    """
+    发件箱后台发送器：批量领取到期邮件，经连接池并发投递，失败按指数退避重试。
+    写入发件箱后调用 wake() 可立即触发一轮，否则每 poll_interval 秒轮询一次。
+    """
+
+    def __init__(self, session_factory, pool: SMTPConnectionPool, batch_size: int = 20,
+                 poll_interval: float = 5.0, lease_seconds: float = 120.0, max_attempts: int = 6,
+                 retry_base_delay: float = 10.0, retry_max_delay: float = 900.0):
+        self.session_factory = session_factory
+        self.pool = pool
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self.queue_depth = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    @classmethod
+    def from_settings(cls, session_factory) -> "EmailSender":
+        return cls(
+            session_factory,
+            SMTPConnectionPool.from_settings(),
+            batch_size=settings.EMAIL_BATCH_SIZE,
+            poll_interval=settings.EMAIL_POLL_INTERVAL,
+            lease_seconds=settings.EMAIL_LEASE_SECONDS,
+            max_attempts=settings.EMAIL_MAX_ATTEMPTS,
+            retry_base_delay=settings.EMAIL_RETRY_BASE_DELAY,
+            retry_max_delay=settings.EMAIL_RETRY_MAX_DELAY,
+        )
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name="email-sender")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._task, timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+            self._task = None
+        await self.pool.close()
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            # 先清再处理：处理期间的 wake() 不会丢
+            self._wakeup.clear()
+            try:
+                processed = await self.process_batch()
+            except Exception:
+                logger.exception("email outbox batch failed")
+                processed = 0
+            if processed >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _retry_delay(self, item: EmailOutbox, error: Exception) -> Optional[float]:
+        import aiosmtplib
+        # 5xx 为永久错误，不重试
+        if isinstance(error, aiosmtplib.SMTPResponseException) and error.code >= 500:
+            return None
+        if isinstance(error, aiosmtplib.SMTPRecipientsRefused) or item.attempts >= self.max_attempts:
+            return None
+        delay = min(self.retry_base_delay * 2 ** (item.attempts - 1), self.retry_max_delay)
+        return delay * random.uniform(0.8, 1.2)
+
+    async def _deliver(self, item: EmailOutbox) -> Optional[Exception]:
+        import aiosmtplib
+        message = build_message(item.to_email, item.subject, item.body)
+        for attempt in range(2):
+            try:
+                async with self.pool.connection() as smtp:
+                    await smtp.send_message(message)
+                return None
+            except (aiosmtplib.SMTPServerDisconnected, ConnectionError) as exc:
+                # 池里的空闲连接可能已被服务器断开，换新连接再试一次
+                if attempt == 0:
+                    continue
+                return exc
+            except Exception as exc:
+                return exc
+
+    async def process_batch(self) -> int:
+        """领取并投递一批，返回处理条数"""
+        async with self.session_factory() as db:
+            items = await claim_batch(db, self.batch_size, self.lease_seconds)
+            if not items:
+                self.queue_depth = await pending_count(db)
+                return 0
+        errors = await asyncio.gather(*(self._deliver(item) for item in items))
+        async with self.session_factory() as db:
+            await mark_sent(db, [item.id for item, error in zip(items, errors) if error is None])
+            for item, error in zip(items, errors):
+                if error is None:
+                    continue
+                delay = self._retry_delay(item, error)
+                await mark_retry(db, item.id, f"{type(error).__name__}: {error}", delay)
+                if delay is None:
+                    self.failed += 1
+                    logger.error("email %s to %s failed permanently: %s", item.id, item.to_email, error)
+                else:
+                    self.retried += 1
+                    logger.warning("email %s to %s failed, retry in %.0fs: %s", item.id, item.to_email, delay, error)
+            await db.commit()
+            self.queue_depth = await pending_count(db)
+        self.sent += sum(1 for error in errors if error is None)
+        return len(items)
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "queue_depth": self.queue_depth,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "pool_size": self.pool.size,
+            "pool_idle": self.pool.idle,
+            "smtp_connects": self.pool.connects,
+        }
+
+
+email_sender = EmailSender.from_settings(AsyncSessionLocal)
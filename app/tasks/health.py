@@ -0,0 +1,8 @@
+from app.core.config import settings
+from app.db.session import db_manager
+from app.tasks.periodic import PeriodicTask
+
+# 只读副本健康检查：失败时读请求回退主库，恢复后自动切回
+replica_health_check = PeriodicTask(
+    "replica-health-check", settings.DB_REPLICA_HEALTH_INTERVAL, db_manager.check_replica,
+)
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Set, Tuple
+from app.core.cloudinary_client import delete_resources_sync, list_resources_sync
+from app.core.config import settings
+from app.core.metrics import run_in_threadpool_timed
+from app.crud.fruit.image_asset import asset_ref_snapshot, drop_unreferenced_assets, referenced_public_ids
+from app.db.session import AsyncSessionLocal
+from app.tasks.periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+# 上传时使用的 Cloudinary 目录（原图 fruits/，衍生图 fruits/derived/）
+CLOUDINARY_PREFIX = "fruits/"
+
+
+class DestroyQueue:
+    """
+    Cloudinary 删除队列：数据库提交后入队，后台凑批调用 delete_resources，
+    不在请求里逐个 destroy。失败的 id 留在队列里下一轮重试，超过 max_attempts 放弃。
+    队列只在进程内，停止时会尽量清空；进程崩溃丢掉的由孤儿清理兜底。
+    """
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 2.0, max_attempts: int = 5):
+        self.batch_size = max(1, min(batch_size, 100))  # delete_resources 单次上限 100
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._pending: Dict[str, int] = {}  # public_id → 已失败次数，按入队顺序
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.destroyed = 0
+        self.not_found = 0
+        self.failed = 0
+        self.batches = 0
+
+    @classmethod
+    def from_settings(cls) -> "DestroyQueue":
+        return cls(
+            batch_size=settings.CLOUDINARY_DESTROY_BATCH_SIZE,
+            flush_interval=settings.CLOUDINARY_DESTROY_FLUSH_INTERVAL,
+            max_attempts=settings.CLOUDINARY_DESTROY_MAX_ATTEMPTS,
+        )
+
+    def enqueue(self, public_ids: Iterable[str]) -> None:
+        for public_id in public_ids:
+            if public_id:
+                self._pending.setdefault(public_id, 0)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name="cloudinary-destroy-queue")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        self._task = None
+        if self._pending:
+            logger.warning("%d cloudinary resources left undeleted at shutdown", len(self._pending))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("cloudinary destroy batch failed")
+            if self._stopping:
+                return
+
+    async def flush(self) -> int:
+        """按批删除当前队列；某批失败即停止本轮，返回成功处理的个数"""
+        done = 0
+        while self._pending:
+            batch = list(self._pending)[:self.batch_size]
+            try:
+                res = await run_in_threadpool_timed("cloudinary_delete_resources", delete_resources_sync, batch)
+            except Exception as exc:
+                for public_id in batch:
+                    attempts = self._pending[public_id] + 1
+                    if attempts >= self.max_attempts:
+                        del self._pending[public_id]
+                        self.failed += 1
+                    else:
+                        self._pending[public_id] = attempts
+                logger.warning("cloudinary delete_resources failed for %d ids: %s", len(batch), exc)
+                return done
+            self.batches += 1
+            statuses = (res or {}).get("deleted") or {}
+            for public_id in batch:
+                del self._pending[public_id]
+                if statuses.get(public_id) == "not_found":
+                    self.not_found += 1
+                else:
+                    self.destroyed += 1
+            done += len(batch)
+        return done
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "pending": len(self._pending),
+            "destroyed": self.destroyed,
+            "not_found": self.not_found,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+destroy_queue = DestroyQueue.from_settings()
+
+
+def _created_at(resource: dict) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(resource["created_at"].replace("Z", "+00:00"))
+    except (KeyError, AttributeError, ValueError):
+        return None
+
+
+def _asset_hashes(assets: Dict[str, Tuple[str, int]], public_ids: Iterable[str]) -> Set[str]:
+    return {assets[pid][0] for pid in public_ids if pid in assets}
+
+
+async def reconcile_orphans() -> int:
+    """
+    找出 Cloudinary 上存在、fruits.images 已不再引用的资源并入删除队列，返回本轮找到的个数。
+    只处理创建超过 CLOUDINARY_ORPHAN_MIN_AGE 秒的资源，避开上传完成、尚未登记的那段时间。
+    有资源记录的孤儿先删记录（引用数与快照一致时），否则新上传的相同内容会复用已删除的远端资源。
+    """
+    async with AsyncSessionLocal() as db:
+        # 先读资源记录再读引用：两次读取之间被复用的资源，引用数会和快照对不上
+        assets = await asset_ref_snapshot(db)
+        referenced = await referenced_public_ids(db)
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.CLOUDINARY_ORPHAN_MIN_AGE)
+    orphans = []
+    cursor = None
+    while len(orphans) < settings.CLOUDINARY_ORPHAN_SWEEP_MAX:
+        page = await run_in_threadpool_timed(
+            "cloudinary_list_resources", list_resources_sync, prefix=CLOUDINARY_PREFIX, next_cursor=cursor,
+        )
+        for resource in page.get("resources", []):
+            created_at = _created_at(resource)
+            public_id = resource.get("public_id")
+            if public_id and public_id not in referenced and created_at is not None and created_at < cutoff:
+                orphans.append(public_id)
+        cursor = page.get("next_cursor")
+        if not cursor:
+            break
+    # 原图或任一衍生图仍被引用的资源整体保留
+    in_use = _asset_hashes(assets, referenced)
+    orphans = [pid for pid in orphans[:settings.CLOUDINARY_ORPHAN_SWEEP_MAX]
+               if pid not in assets or assets[pid][0] not in in_use]
+    if not orphans:
+        return 0
+    if settings.CLOUDINARY_ORPHAN_DRY_RUN:
+        logger.info("orphan sweep (dry run): %d unreferenced cloudinary resources, e.g. %s",
+                    len(orphans), orphans[:10])
+        return len(orphans)
+    tracked = dict(assets[pid] for pid in orphans if pid in assets)
+    async with AsyncSessionLocal() as db:
+        dropped = await drop_unreferenced_assets(db, tracked)
+        # 删掉记录后再核对一次：两次读取之间被复用、又被别处释放（引用数恰好不变）的资源不能删
+        if dropped and _asset_hashes(assets, await referenced_public_ids(db)) & dropped:
+            await db.rollback()
+            dropped = set()
+        else:
+            await db.commit()
+    orphans = [pid for pid in orphans if pid not in assets or assets[pid][0] in dropped]
+    logger.info("orphan sweep: queueing %d unreferenced cloudinary resources for deletion (%d asset records dropped)",
+                len(orphans), len(dropped))
+    destroy_queue.enqueue(orphans)
+    return len(orphans)
+
+
+orphan_sweeper = PeriodicTask(
+    "cloudinary-orphan-sweeper", settings.CLOUDINARY_ORPHAN_SWEEP_INTERVAL, reconcile_orphans, jitter=0.5,
+)
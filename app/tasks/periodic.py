@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    在事件循环里按固定间隔执行一个协程函数；单次失败只记录日志，不中断循环。
+    首次执行前随机延迟一段时间，避免多个 worker 同时启动时一起跑。
+    """
+
+    def __init__(self, name: str, interval: float, fn: Callable[[], Awaitable[object]], jitter: float = 0.1):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.jitter = jitter
+        self._task: Optional[asyncio.Task] = None
+        self._stop = asyncio.Event()
+        self.runs = 0
+        self.failures = 0
+        self.last_result = None
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._stop.clear()
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=10)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        self._task = None
+
+    async def _sleep(self, seconds: float) -> bool:
+        """等待 seconds 秒，期间被 stop() 唤醒则返回 True"""
+        try:
+            await asyncio.wait_for(self._stop.wait(), seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _run(self) -> None:
+        if await self._sleep(random.uniform(0, self.interval * self.jitter)):
+            return
+        while True:
+            try:
+                self.last_result = await self.fn()
+                self.runs += 1
+            except Exception:
+                self.failures += 1
+                logger.exception("periodic task %s failed", self.name)
+            if await self._sleep(self.interval):
+                return
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "interval": self.interval,
+            "running": self._task is not None and not self._task.done(),
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_result": self.last_result,
+        }
@@ -0,0 +1,69 @@
+"""
+对比两次压测结果（benchmarks.run 的 JSON 输出）：
+
+  python -m benchmarks.compare base.json head.json [--threshold 10] [--fail-on-regression]
+
+p95 变慢或吞吐下降超过 threshold%，或每请求 SQL 条数增加，记为回退。
+"""
+import argparse
+import json
+import sys
+
+
+def pct_change(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare(base: dict, head: dict, threshold: float):
+    rows, regressions = [], []
+    for name, new in head["results"].items():
+        old = base["results"].get(name)
+        if old is None:
+            continue
+        p95 = pct_change(old["p95_ms"], new["p95_ms"])
+        rps = pct_change(old["rps"], new["rps"])
+        queries = new["queries_per_request"] - old["queries_per_request"]
+        reasons = []
+        if p95 > threshold:
+            reasons.append(f"p95 +{p95:.1f}%")
+        if rps < -threshold:
+            reasons.append(f"rps {rps:.1f}%")
+        if queries > 0.01:
+            reasons.append(f"queries/req +{queries:.2f}")
+        rows.append((name, old, new, p95, rps, queries, reasons))
+        if reasons:
+            regressions.append((name, reasons))
+    return rows, regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="允许的波动百分比")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as fh:
+        base = json.load(fh)
+    with open(args.head, encoding="utf-8") as fh:
+        head = json.load(fh)
+
+    print(f"base {base['meta'].get('revision')}  vs  head {head['meta'].get('revision')}")
+    header = f"{'workload':<14}{'p95 base':>10}{'p95 head':>10}{'Δp95':>9}{'rps base':>10}{'rps head':>10}{'Δrps':>9}{'Δq/req':>8}"
+    print(header)
+    print("-" * len(header))
+    rows, regressions = compare(base, head, args.threshold)
+    for name, old, new, p95, rps, queries, reasons in rows:
+        flag = "  <-- " + ", ".join(reasons) if reasons else ""
+        print(f"{name:<14}{old['p95_ms']:>10.2f}{new['p95_ms']:>10.2f}{p95:>8.1f}%"
+              f"{old['rps']:>10.1f}{new['rps']:>10.1f}{rps:>8.1f}%{queries:>8.2f}{flag}")
+    if regressions:
+        print(f"\n{len(regressions)} workload(s) regressed beyond {args.threshold}%")
+        return 1 if args.fail_on_regression else 0
+    print("\nno regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
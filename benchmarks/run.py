@@ -0,0 +1,209 @@
+"""
+进程内压测：用 httpx.ASGITransport 直接驱动 app.main.app（不经网络），
+在本地数据库上按固定并发跑各接口负载，输出延迟分位数、吞吐和每请求 SQL 条数。
+
+  pip install -r requirements.txt -r benchmarks/requirements.txt
+  python -m benchmarks.run --fruits 5000 --concurrency 16 --output bench-HEAD.json
+  python -m benchmarks.run --workloads list,detail,bulk_create --no-cache
+  python -m benchmarks.compare bench-base.json bench-HEAD.json
+
+默认使用 ./bench.db（SQLite），可用 --database-url 指向一次性的 PostgreSQL 库；
+目标库会被清空重建。限流、邮件发送器和预热在压测期间关闭。
+SQLite 只允许单写者，bulk_create 在并发下可能出现 "database is locked"，
+写入类负载的数据以 PostgreSQL 为准。
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Settings 在导入时读取环境变量，必须在导入 app 之前设置
+BENCH_ENV = {
+    "SECRET_KEY": "bench-secret",
+    "EMAIL_HOST": "localhost",
+    "EMAIL_PORT": "25",
+    "EMAIL_USER": "bench@example.com",
+    "EMAIL_PASSWORD": "bench",
+    "CLOUDINARY_CLOUD_NAME": "bench",
+    "CLOUDINARY_API_KEY": "bench",
+    "CLOUDINARY_API_SECRET": "bench",
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "sqlite+aiosqlite:///./bench.db"))
+    parser.add_argument("--fruits", type=int, default=2000, help="预置水果条数")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workloads", default="", help="逗号分隔，默认全部")
+    parser.add_argument("--requests", type=int, default=None, help="每个负载的请求数，默认按负载各自的默认值")
+    parser.add_argument("--warmup", type=int, default=20, help="每个负载开始前不计入统计的请求数")
+    parser.add_argument("--no-cache", action="store_true", help="关闭响应缓存，测量每次查库的开销")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="结果 JSON 写入路径")
+    return parser.parse_args(argv)
+
+
+def configure_env(args) -> None:
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["EMAIL_SENDER_ENABLED"] = "false"
+    os.environ["WARMUP_ENABLED"] = "false"
+    if args.no_cache:
+        os.environ["FRUIT_CACHE_TTL"] = "0"
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def git_revision() -> Optional[str]:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True)
+        return rev.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class QueryCounter:
+    """统计引擎上执行的 SQL 条数"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+
+async def run_workload(client, fn, ctx, total: int, warmup: int, concurrency: int,
+                       seed: int, queries: QueryCounter) -> Dict[str, object]:
+    for i in range(warmup):
+        await fn(client, ctx, random.Random(seed - i - 1))
+
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    remaining = iter(range(total))
+
+    async def worker(worker_id: int):
+        rng = random.Random(seed * 1000 + worker_id)
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                status = (await fn(client, ctx, rng)).status_code
+            except Exception as exc:  # 计为错误继续跑
+                status = type(exc).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+
+    queries_before = queries.count
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    n_queries = queries.count - queries_before
+
+    latencies.sort()
+    done = len(latencies)
+    errors = sum(n for status, n in statuses.items() if not (isinstance(status, int) and status < 400))
+    return {
+        "requests": done,
+        "errors": errors,
+        "statuses": {str(k): v for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))},
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(done / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / done * 1000, 3) if done else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if done else 0.0,
+        "queries_per_request": round(n_queries / done, 2) if done else 0.0,
+    }
+
+
+def print_table(results: Dict[str, dict]) -> None:
+    header = f"{'workload':<14}{'req':>7}{'err':>5}{'rps':>10}{'p50':>9}{'p95':>9}{'p99':>9}{'q/req':>7}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(f"{name:<14}{r['requests']:>7}{r['errors']:>5}{r['rps']:>10.1f}"
+              f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['queries_per_request']:>7.2f}")
+
+
+async def main_async(args) -> dict:
+    import httpx
+    from app.core.security import create_access_token, hash_pool
+    from app.db.session import engine
+    from app.main import app
+    from benchmarks.seed import seed
+    from benchmarks.workloads import WORKLOADS, Context
+
+    names = [n.strip() for n in args.workloads.split(",") if n.strip()] or list(WORKLOADS)
+    unknown = [n for n in names if n not in WORKLOADS]
+    if unknown:
+        raise SystemExit(f"unknown workloads: {', '.join(unknown)} (available: {', '.join(WORKLOADS)})")
+
+    print(f"seeding {args.fruits} fruits into {engine.url.render_as_string(hide_password=True)} ...", file=sys.stderr)
+    seeded = await seed(args.fruits, args.users, args.seed)
+    ctx = Context(fruit_ids=seeded["fruit_ids"], emails=seeded["emails"])
+    ctx.token = create_access_token({"sub": ctx.emails[0]})
+
+    queries = QueryCounter(engine)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for name in names:
+            fn, default_requests = WORKLOADS[name]
+            print(f"running {name} ...", file=sys.stderr)
+            results[name] = await run_workload(
+                client, fn, ctx, args.requests or default_requests, args.warmup,
+                args.concurrency, args.seed, queries,
+            )
+    hash_pool.shutdown(wait=False)
+    await engine.dispose()
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": engine.dialect.name,
+            "fruits": args.fruits,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "response_cache": not args.no_cache,
+        },
+        "results": results,
+    }
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    configure_env(args)
+    report = asyncio.run(main_async(args))
+    print_table(report["results"])
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+        print(f"results written to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,72 @@
+"""生成基准测试数据：N 条带图片 / 营养信息的水果和若干用户"""
+import random
+from typing import List
+from app.crud.fruit.fruit import bulk_create
+from app.db.base import Base
+from app.db.models.user.user import User
+from app.db.session import AsyncSessionLocal, engine
+from app.schemas.fruit.fruit import FruitCreate
+
+NAMES = ["苹果", "香蕉", "橙子", "葡萄", "西瓜", "芒果", "菠萝", "草莓", "樱桃", "猕猴桃", "柚子", "荔枝", "龙眼", "榴莲", "石榴"]
+ORIGINS = ["山东", "海南", "广西", "云南", "新疆", "陕西", "福建", "四川", "泰国", "智利"]
+SEASONS = ["spring", "summer", "autumn", "winter"]
+SUITABLE = ["儿童", "老人", "孕妇", "健身", "减脂"]
+
+BENCH_PASSWORD = "Bench-pass1!"
+
+
+def fake_fruit(rng: random.Random, i: int) -> dict:
+    images = [
+        {
+            "url": f"https://res.cloudinary.com/demo/image/upload/v1/fruits/{i}-{j}.jpg",
+            "secure_url": f"https://res.cloudinary.com/demo/image/upload/v1/fruits/{i}-{j}.jpg",
+            "public_id": f"fruits/{i}-{j}",
+            "alt": f"{i}-{j}.jpg",
+            "source": "cloudinary",
+            "width": 1200,
+            "height": 900,
+            "bytes": rng.randint(80_000, 900_000),
+            "format": "jpeg",
+        }
+        for j in range(rng.randint(1, 4))
+    ]
+    payload = {
+        "name_cn": f"{rng.choice(NAMES)}{i}",
+        "images": images,
+        "origin": rng.sample(ORIGINS, rng.randint(1, 3)),
+        "season": rng.sample(SEASONS, rng.randint(1, 2)),
+        "nutritional_value": {
+            "calories_kcal": round(rng.uniform(20, 160), 1),
+            "protein_g": round(rng.uniform(0, 3), 2),
+            "fat_g": round(rng.uniform(0, 2), 2),
+            "carbs_g": round(rng.uniform(5, 35), 2),
+            "sugar_g": round(rng.uniform(2, 25), 2),
+            "fiber_g": round(rng.uniform(0, 6), 2),
+            "vitamin_c_mg": round(rng.uniform(0, 90), 1),
+            "potassium_mg": round(rng.uniform(50, 500), 1),
+        },
+        "suitable_for": rng.sample(SUITABLE, rng.randint(0, 3)),
+        "description": "口感清甜，果肉多汁，" * rng.randint(2, 12),
+    }
+    # 与 API 写路径一致：经 schema 规范化后入库
+    return FruitCreate(**payload).model_dump(mode="json")
+
+
+async def seed(n_fruits: int, n_users: int = 5, seed_value: int = 42) -> dict:
+    """重建全部表并写入数据，返回 {"fruit_ids": [...], "emails": [...]}"""
+    from app.core.security import hash_password_async
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    rng = random.Random(seed_value)
+    fruit_ids: List[str] = []
+    async with AsyncSessionLocal() as db:
+        for start in range(0, n_fruits, 1000):
+            batch = [fake_fruit(rng, i) for i in range(start, min(n_fruits, start + 1000))]
+            fruit_ids.extend(o.id for o in await bulk_create(db, batch))
+        hashed = await hash_password_async(BENCH_PASSWORD)
+        emails = [f"bench{i}@example.com" for i in range(n_users)]
+        db.add_all(User(email=email, hashed_password=hashed) for email in emails)
+        await db.commit()
+    return {"fruit_ids": fruit_ids, "emails": emails}
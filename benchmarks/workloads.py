@@ -0,0 +1,70 @@
+"""各接口的压测负载：每个负载是 async (client, ctx, rng) -> httpx.Response"""
+import random
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List
+import httpx
+from benchmarks.seed import BENCH_PASSWORD, NAMES, ORIGINS, fake_fruit
+
+FRUITS = "/api/v1/fruits"
+
+
+@dataclass
+class Context:
+    fruit_ids: List[str]
+    emails: List[str]
+    token: str = ""
+    counter: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def auth(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+async def list_page(client: httpx.AsyncClient, ctx: Context, rng: random.Random):
+    sort = rng.choice(["name_cn:asc", "created_at:desc", "updated_at:desc"])
+    return await client.get(f"{FRUITS}/", params={"page": rng.randint(1, 20), "per_page": 50, "sort_by": sort})
+
+
+async def list_full_page(client: httpx.AsyncClient, ctx: Context, rng: random.Random):
+    return await client.get(f"{FRUITS}/", params={"page": rng.randint(1, 5), "per_page": 200})
+
+
+async def list_filtered(client: httpx.AsyncClient, ctx: Context, rng: random.Random):
+    return await client.get(f"{FRUITS}/", params={"origin": rng.choice(ORIGINS), "per_page": 20})
+
+
+async def detail(client: httpx.AsyncClient, ctx: Context, rng: random.Random):
+    return await client.get(f"{FRUITS}/{rng.choice(ctx.fruit_ids)}")
+
+
+async def search(client: httpx.AsyncClient, ctx: Context, rng: random.Random):
+    return await client.get(f"{FRUITS}/", params={"q": rng.choice(NAMES), "per_page": 20})
+
+
+async def facets(client: httpx.AsyncClient, ctx: Context, rng: random.Random):
+    return await client.get(f"{FRUITS}/facets", params={"q": rng.choice(NAMES)})
+
+
+async def bulk_create_50(client: httpx.AsyncClient, ctx: Context, rng: random.Random):
+    n = ctx.counter["bulk"] = ctx.counter.get("bulk", 0) + 1
+    items = [fake_fruit(rng, 10_000_000 + n * 50 + i) for i in range(50)]
+    return await client.post(f"{FRUITS}/bulk_create", json=items, headers=ctx.auth)
+
+
+async def login(client: httpx.AsyncClient, ctx: Context, rng: random.Random):
+    return await client.post("/users/login", json={"email": rng.choice(ctx.emails), "password": BENCH_PASSWORD})
+
+
+# 名称 → (负载函数, 默认请求数)；login 每次一次 argon2，默认请求数少一些
+WORKLOADS: Dict[str, tuple] = {
+    "list": (list_page, 1000),
+    "list_200": (list_full_page, 300),
+    "list_filtered": (list_filtered, 1000),
+    "detail": (detail, 2000),
+    "search": (search, 1000),
+    "facets": (facets, 500),
+    "bulk_create": (bulk_create_50, 100),
+    "login": (login, 100),
+}
+
+Workload = Callable[[httpx.AsyncClient, Context, random.Random], Awaitable[httpx.Response]]
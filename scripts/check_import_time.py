@@ -0,0 +1,71 @@
+"""
+启动开销检查：用 `python -X importtime -c "import app.main"` 测量导入耗时。
+
+  python scripts/check_import_time.py [--budget-ms 2000] [--module app.main]
+
+两项检查，任一失败退出码为 1（可直接放进 CI）：
+1. 目标模块的累计导入耗时不超过预算（毫秒，受机器性能影响，按部署环境调整）；
+2. 重型依赖（Cloudinary、Pillow、passlib/argon2、aiosmtplib）不在导入期加载，
+   它们应在首次使用或启动后的预热任务里加载（见 app/core/warmup.py）。
+
+需要与运行服务相同的环境变量（DATABASE_URL 等），否则 Settings 初始化会失败。
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+LAZY_MODULES = ("cloudinary", "PIL", "passlib", "argon2", "aiosmtplib")
+
+
+def measure(module: str):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"importing {module} failed")
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if not parts[0].isdigit():
+            continue  # 表头
+        self_us, cumulative_us, name = int(parts[0]), int(parts[1]), parts[2]
+        timings[name] = (self_us, cumulative_us)
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", 2000)))
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    timings = measure(args.module)
+    total_ms = timings[args.module][1] / 1000
+    eager = sorted({name.split(".")[0] for name in timings} & set(LAZY_MODULES))
+
+    print(f"{args.module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print("slowest modules (cumulative):")
+    for name, (_, cumulative) in sorted(timings.items(), key=lambda kv: -kv[1][1])[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    ok = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: import time {total_ms:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+        ok = False
+    if eager:
+        print(f"FAIL: heavy modules imported eagerly: {', '.join(eager)}")
+        ok = False
+    if ok:
+        print("OK")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,106 @@
+"""
+SQL 条数检查（N+1 回归）：用 assert_max_queries 约束水果列表和 batchGet 接口每次请求的 SQL 条数。
+
+  python scripts/check_query_budget.py [--database-url sqlite+aiosqlite:///...] [--rows 50]
+
+默认在临时目录新建一个 SQLite 库，建表、写入 --rows 条样例数据后，经 ASGI 直接请求各接口
+（缓存未命中 / 命中各一次），任一超出预算退出码为 1（可直接放进 CI）。
+指定 --database-url 时会在该库建表并写入样例数据，不要指向生产库。
+其余环境变量（SECRET_KEY 等）需与运行服务相同，否则 Settings 初始化会失败。
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# (说明, 方法, 路径, 请求参数, 缓存未命中 / 命中时的 SQL 上限)
+# 列表未命中：一页数据 + 总数（总数有自己的缓存，翻页时不再 COUNT）；投影结果不进详情缓存
+CASES = [
+    ("list", "GET", "/api/v1/fruits/", {}, 2, 0),
+    ("list page 2", "GET", "/api/v1/fruits/", {"params": {"page": 2, "per_page": 10}}, 2, 0),
+    ("list filtered", "GET", "/api/v1/fruits/", {"params": {"q": "果", "origin": "山东", "season": "秋"}}, 3, 0),
+    ("list projected", "GET", "/api/v1/fruits/", {"params": {"fields": "name_cn,images", "images_limit": 1}}, 2, 0),
+    ("list without count", "GET", "/api/v1/fruits/", {"params": {"count": "none"}}, 1, 0),
+    ("batchGet", "GET", "/api/v1/fruits:batchGet", {"ids": True}, 1, 0),
+    ("batchGet projected", "GET", "/api/v1/fruits:batchGet", {"ids": True, "params": {"fields": "name_cn"}}, 1, 1),
+    ("batchGet POST", "POST", "/api/v1/fruits:batchGet", {"ids": True}, 1, 0),
+]
+
+
+def sample_fruit(i: int) -> dict:
+    image = {"url": f"https://res.cloudinary.com/demo/image/upload/v1/fruits/{i}.jpg", "public_id": f"fruits/{i}"}
+    return {
+        "name_cn": f"水果{i}", "images": [image, image], "origin": ["山东", "海南"][i % 2:], "season": ["秋"],
+        "nutritional_value": {"calories_kcal": 40 + i, "protein_g": 0.5, "fat_g": 0.1, "carbs_g": 10.0,
+                              "sugar_g": 8.0, "fiber_g": 2.0, "vitamin_c_mg": 5.0, "potassium_mg": 100.0},
+        "suitable_for": [], "description": "样例",
+    }
+
+
+async def run(rows: int) -> list:
+    import httpx
+    from app.core.metrics import QueryBudgetExceeded, assert_max_queries, instrument_engine
+    from app.crud.fruit.cache import invalidate_fruit_responses
+    from app.crud.fruit.fruit import bulk_create
+    from app.db.session import AsyncSessionLocal, db_manager
+    from app.main import app
+
+    # METRICS_ENABLED 关闭时 main 不会给引擎挂计数事件
+    for engine in db_manager.engines:
+        instrument_engine(engine)
+    await db_manager.create_all()
+    await db_manager.upgrade_schema()
+    async with AsyncSessionLocal() as db:
+        created = await bulk_create(db, [sample_fruit(i) for i in range(rows)])
+        await db.commit()
+        ids = [obj.id for obj in created][:20]
+
+    failures = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://check") as client:
+        for label, method, path, options, miss_limit, hit_limit in CASES:
+            kwargs = {"params": dict(options.get("params", {}))}
+            if options.get("ids"):
+                if method == "GET":
+                    kwargs["params"]["ids"] = ",".join(ids)
+                else:
+                    kwargs["json"] = {"ids": ids}
+            await invalidate_fruit_responses(ids)
+            for state, budget in (("miss", miss_limit), ("hit", hit_limit)):
+                try:
+                    with assert_max_queries(budget) as stats:
+                        response = await client.request(method, path, **kwargs)
+                except QueryBudgetExceeded as exc:
+                    failures.append(f"{label} ({state}): {exc}")
+                    continue
+                if response.status_code != 200:
+                    failures.append(f"{label} ({state}): HTTP {response.status_code} {response.text[:200]}")
+                    continue
+                print(f"  {label:<20} {state:<5} {stats.queries} queries (budget {budget})")
+    await db_manager.dispose()
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--rows", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 必须在导入 app 之前设置，引擎按 settings.DATABASE_URL 创建
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite+aiosqlite:///{tmp}/query_budget.db"
+        failures = asyncio.run(run(args.rows))
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
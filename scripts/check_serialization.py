@@ -0,0 +1,145 @@
+"""
+序列化一致性检查：同一批行分别走快速路径（fruit_to_dict / fruits_to_dicts + json_dumps）
+和 Pydantic response_model 路径（Fruit / PaginatedFruits 的 model_dump_json），断言输出逐字节相同。
+
+  python scripts/check_serialization.py
+
+覆盖：正常写入的行、旧数据（列为 NULL、图片缺少新字段）、整数营养值、带衍生图的图片、
+fields= 投影、images_limit 截断和列表响应外层；orjson 与标准库 json 两种 json_dumps 实现各跑一遍。
+任一不一致退出码为 1（可直接放进 CI）。不连接数据库，但导入 app 需要与运行服务相同的环境变量。
+"""
+import os
+import sys
+from datetime import datetime
+from itertools import combinations
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import serialization  # noqa: E402
+from app.core.serialization import json_dumps  # noqa: E402
+from app.db.models.fruit import Fruit as FruitModel  # noqa: E402
+from app.schemas.fruit.fruit import Fruit, FruitCreate, PaginatedFruits  # noqa: E402
+from app.schemas.fruit.serialize import FRUIT_FIELDS, fruit_to_dict, fruits_to_dicts  # noqa: E402
+
+IMAGE_URL = "https://res.cloudinary.com/demo/image/upload/v1/fruits/{}.jpg"
+
+
+def _image(public_id: str, derivatives: bool = True) -> dict:
+    image = {
+        "url": IMAGE_URL.format(public_id), "secure_url": IMAGE_URL.format(public_id),
+        "public_id": f"fruits/{public_id}", "alt": "苹果", "source": "upload",
+        "uploaded_at": "2024-05-01T08:00:00Z", "width": 1200, "height": 800,
+        "bytes": 204800, "format": "jpg", "content_hash": "ab" * 32,
+    }
+    if derivatives:
+        image["derivatives"] = [
+            {"kind": kind, "url": IMAGE_URL.format(f"derived/{public_id}_{kind}"),
+             "public_id": f"fruits/derived/{public_id}_{kind}", "width": width, "height": width,
+             "bytes": width * 40, "format": "webp"}
+            for kind, width in (("thumb", 160), ("medium", 640))
+        ]
+    return image
+
+
+def sample_rows() -> list:
+    """与数据库读出的对象同形：JSON 列是 dict / list，时间是 naive datetime"""
+    created = FruitCreate(
+        name_cn="苹果",
+        images=[_image("apple"), _image("apple2", derivatives=False)],
+        origin=["山东", "陕西"], season=["秋"],
+        nutritional_value={"calories_kcal": 52.1, "protein_g": 0.3, "fat_g": 0.2, "carbs_g": 13.8,
+                           "sugar_g": 10.4, "fiber_g": 2.4, "vitamin_c_mg": 4.6, "potassium_mg": 107},
+        suitable_for=["儿童", "老人"], description='含 "引号"、换行\n和 emoji 🍎',
+    ).model_dump(mode="json")
+    rows = [
+        # 正常写入路径：先经 model_dump(mode="json") 规范化
+        FruitModel(id="f-normal", created_at=datetime(2024, 5, 1, 8, 0, 0, 123456),
+                   updated_at=datetime(2024, 5, 2, 9, 30), version=3, **created),
+        # 整数营养值（旧客户端 / 直接写库），两条路径都应输出 52.0
+        FruitModel(id="f-int-nutrition", name_cn="香蕉", images=[], origin=[], season=[],
+                   nutritional_value={"calories_kcal": 89, "protein_g": 1, "fat_g": 0, "carbs_g": 23,
+                                      "sugar_g": 12, "fiber_g": 3, "vitamin_c_mg": 9, "potassium_mg": 358},
+                   suitable_for=[], description="", created_at=datetime(2024, 1, 1), updated_at=datetime(2024, 1, 1),
+                   version=1),
+        # 旧数据：可空列为 NULL、没有 version，图片是加衍生图 / 元数据之前的格式
+        FruitModel(id="f-legacy", name_cn="梨", images=[{"url": IMAGE_URL.format("pear"), "public_id": "fruits/pear"}],
+                   origin=None, season=None, nutritional_value=None, suitable_for=None, description=None,
+                   created_at=None, updated_at=None, version=None),
+        FruitModel(id="f-legacy-nutrition", name_cn="桃",
+                   images=[{"url": IMAGE_URL.format("peach"), "derivatives": None}],
+                   origin=["河北"], season=None,
+                   nutritional_value={"calories_kcal": None, "protein_g": 0.9, "fat_g": None, "carbs_g": 9.5,
+                                      "sugar_g": None, "fiber_g": 1.5, "vitamin_c_mg": 6.6, "potassium_mg": None},
+                   suitable_for=None, description="旧数据", created_at=datetime(2020, 2, 29, 23, 59, 59),
+                   updated_at=None, version=None),
+    ]
+    return rows
+
+
+def _pydantic(row, fields=FRUIT_FIELDS, images_limit=None) -> bytes:
+    model = Fruit.model_validate(row, from_attributes=True)
+    if images_limit is not None and model.images is not None:
+        model.images = model.images[:images_limit]
+    include = None if tuple(fields) == FRUIT_FIELDS else set(fields)
+    return model.model_dump_json(include=include).encode("utf-8")
+
+
+def _projections():
+    # 全字段、单字段和若干组合；与 parse_fields 一致：总含 id，顺序按 schema
+    yield FRUIT_FIELDS
+    selections = [{name} for name in FRUIT_FIELDS if name != "id"]
+    selections += [set(pair) for pair in combinations(("images", "nutritional_value", "origin", "created_at", "version"), 2)]
+    for selected in selections:
+        yield tuple(f for f in FRUIT_FIELDS if f in selected | {"id"})
+
+
+def check() -> list:
+    failures = []
+    rows = sample_rows()
+
+    def compare(label, fast: bytes, slow: bytes):
+        if fast != slow:
+            failures.append(f"{label}\n    fast:     {fast.decode()}\n    pydantic: {slow.decode()}")
+
+    for row in rows:
+        for fields in _projections():
+            compare(f"{row.id} fields={','.join(fields)}",
+                    json_dumps(fruit_to_dict(row, fields)), _pydantic(row, fields))
+        compare(f"{row.id} images_limit=1",
+                json_dumps(fruit_to_dict(row, images_limit=1)), _pydantic(row, images_limit=1))
+
+    # 列表响应外层：字段顺序与 PaginatedFruits 一致
+    for total, next_cursor in ((len(rows), None), (None, "opaque-cursor")):
+        fast = json_dumps({
+            "items": fruits_to_dicts(rows), "total": total, "page": 1, "per_page": 20, "next_cursor": next_cursor,
+        })
+        slow = PaginatedFruits(
+            items=[Fruit.model_validate(o, from_attributes=True) for o in rows],
+            total=total, page=1, per_page=20, next_cursor=next_cursor,
+        ).model_dump_json().encode("utf-8")
+        compare(f"list total={total} next_cursor={next_cursor}", fast, slow)
+    return failures
+
+
+def main() -> int:
+    backends = [("orjson", serialization.orjson)] if serialization.orjson is not None else []
+    backends.append(("json", None))
+    ok = True
+    for name, module in backends:
+        original = serialization.orjson
+        serialization.orjson = module
+        try:
+            failures = check()
+        finally:
+            serialization.orjson = original
+        for failure in failures:
+            print(f"FAIL [{name}] {failure}")
+        ok = ok and not failures
+        print(f"{name}: {'OK' if not failures else f'{len(failures)} mismatches'}")
+    if ok:
+        print("OK")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())